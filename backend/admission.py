@@ -0,0 +1,117 @@
+import asyncio
+import collections
+import contextlib
+import os
+
+from destinations import canonical_destination
+import metrics
+
+# Admission control. Every WebSocket stream takes a slot of a process-wide limit, and clients
+# watching a port (/ws/ships, port subscriptions on /ws/stream, port-filtered geofence events)
+# also take one of that port's slots. /rotterdam analytics requests run at most
+# ANALYTICS_CONCURRENCY at a time with a short bounded wait. Whatever does not fit is turned
+# away straight away, with HTTP 503 or WebSocket close code 1013 (try again later) plus a
+# retry-after, instead of slowing down every client already being served.
+
+MAX_STREAM_CLIENTS = int(os.getenv("MAX_STREAM_CLIENTS", "1000"))  # per process
+MAX_STREAM_CLIENTS_PER_PORT = int(os.getenv("MAX_STREAM_CLIENTS_PER_PORT", "300"))
+ANALYTICS_CONCURRENCY = int(os.getenv("ANALYTICS_CONCURRENCY", "4"))
+ANALYTICS_MAX_WAITING = int(os.getenv("ANALYTICS_MAX_WAITING", "16"))  # requests queued for a slot
+SHED_RETRY_AFTER = int(os.getenv("SHED_RETRY_AFTER", "5"))  # seconds
+
+# WebSocket close code for "Try Again Later" (RFC 6455 registry)
+WS_TRY_AGAIN_LATER = 1013
+
+ADMISSION_DECISIONS = metrics.Counter("admission_decisions_total", "Admission decisions by endpoint and outcome",
+                                      ["endpoint", "decision"])
+
+
+class Shed(Exception):
+    """A request or connection turned away because a limit is reached."""
+
+    def __init__(self, endpoint: str, decision: str, detail: str, retry_after: int = SHED_RETRY_AFTER):
+        super().__init__(detail)
+        self.retry_after = retry_after
+        ADMISSION_DECISIONS.labels(endpoint, decision).inc()
+
+    @property
+    def close_reason(self) -> str:
+        # Close frame reasons are limited to 123 bytes
+        return f"{self} (retry after {self.retry_after}s)"[:123]
+
+
+class StreamAdmission:
+    """Process-wide and per-port limits on concurrent stream clients."""
+
+    def __init__(self, max_clients: int = MAX_STREAM_CLIENTS, max_per_port: int = MAX_STREAM_CLIENTS_PER_PORT):
+        self.max_clients = max_clients
+        self.max_per_port = max_per_port
+        self.clients = 0
+        self.watchers = collections.Counter()  # port -> clients watching it
+        metrics.Gauge("admitted_stream_clients", "WebSocket stream clients holding an admission slot",
+                      callback=lambda: self.clients)
+
+    def admit(self, endpoint: str, port: str = None):
+        """Take a client slot (and a slot of port, if given), raising Shed if a limit is reached."""
+        if self.clients >= self.max_clients:
+            raise Shed(endpoint, "shed_process_limit", "Too many stream clients")
+        if port is not None:
+            self.watch(endpoint, port)
+        self.clients += 1
+        ADMISSION_DECISIONS.labels(endpoint, "admitted").inc()
+
+    def release(self, port: str = None):
+        self.clients -= 1
+        if port is not None:
+            self.unwatch(port)
+
+    def watch(self, endpoint: str, port: str):
+        """Take a slot of port, raising Shed if the port is full."""
+        port = canonical_destination(port)
+        if self.watchers[port] >= self.max_per_port:
+            raise Shed(endpoint, "shed_port_limit", f"Too many clients watching {port}")
+        self.watchers[port] += 1
+
+    def unwatch(self, port: str):
+        port = canonical_destination(port)
+        self.watchers[port] -= 1
+        if self.watchers[port] <= 0:
+            del self.watchers[port]
+
+    @contextlib.contextmanager
+    def connection(self, endpoint: str, port: str = None):
+        """Hold the slots of admit for the lifetime of a WebSocket."""
+        self.admit(endpoint, port)
+        try:
+            yield
+        finally:
+            self.release(port)
+
+
+class ConcurrencyLimit:
+    """At most limit concurrent computations, max_waiting more queued, the rest shed."""
+
+    def __init__(self, limit: int = ANALYTICS_CONCURRENCY, max_waiting: int = ANALYTICS_MAX_WAITING):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.pending = 0  # running and waiting
+        self._semaphore = asyncio.Semaphore(limit)
+        metrics.Gauge("analytics_requests_pending", "Analytics requests running or waiting for a slot",
+                      callback=lambda: self.pending)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, endpoint: str):
+        if self.pending >= self.limit + self.max_waiting:
+            raise Shed(endpoint, "shed_busy", "Analytics are busy")
+        self.pending += 1
+        try:
+            async with self._semaphore:
+                ADMISSION_DECISIONS.labels(endpoint, "admitted").inc()
+                yield
+        finally:
+            self.pending -= 1
+
+
+# Limits shared by the endpoints of this process
+streams = StreamAdmission()
+analytics = ConcurrencyLimit()
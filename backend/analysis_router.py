@@ -1,166 +1,97 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from models import (
     RotterdamInsightsResponse, HourlyInsight, RotterdamSummary,
     RiskTimelineResponse, TimelineDataPoint,
     MultiMetricResponse, MultiMetricDataPoint,
-    RiskDistributionResponse, RiskDistribution
+    RiskDistributionResponse, RiskDistribution,
+    CongestionResponse, CongestionHour
 )
-import pandas as pd
-import json
-from pathlib import Path
-from datetime import datetime
+import math
+from typing import Annotated, Literal, Optional
+import forecast
+from risk import risk_table, STORM_THRESHOLD
+from downsampling import downsample
+from data.vessel_hub import hub as vessel_hub
 
 router = APIRouter(prefix="/rotterdam", tags=["Rotterdam Analysis"])
 
-# Get the directory where this file is located
-BASE_DIR = Path(__file__).resolve().parent
+# The pandas endpoints are plain functions, so FastAPI runs them in its threadpool and the event
+# loop keeps serving streams while they compute; the analytics admission slot in main.py is held
+# until they finish. /congestion only reads the hub's in-memory counts and stays on the loop.
 
+# Downsampled chart responses of the current forecast version, keyed by endpoint and parameters
+_downsampled_cache = {"version": None, "responses": {}}
+MAX_DOWNSAMPLED_RESPONSES = 64
 
-def load_and_normalize_data():
-    """Load and normalize weather and marine data from JSON files."""
-    try:
-        # Load weather data
-        weather_path = BASE_DIR / "weather_data.json"
-        with open(weather_path) as f:
-            weather_raw = json.load(f)["list"]
-        
-        weather_df = pd.json_normalize(weather_raw)
-        
-        # Normalize weather data - select and rename columns
-        weather_df["timestamp"] = pd.to_datetime(weather_df["dt"], unit='s')
-        weather_df["windSpeed"] = weather_df["wind.speed"]
-        weather_df["windDeg"] = weather_df["wind.deg"]
-        weather_df["pop"] = weather_df["pop"]  # probability of precipitation
-        weather_df["temperature"] = weather_df["main.temp"]
-        weather_df["pressure"] = weather_df["main.pressure"]
-        
-        weather_df = weather_df[["timestamp", "windSpeed", "windDeg", "pop", "temperature", "pressure"]]
-        
-        # Load marine data
-        marine_path = BASE_DIR / "marine_data.json"
-        with open(marine_path) as f:
-            marine_raw = json.load(f)["hours"]
-        
-        marine_df = pd.json_normalize(marine_raw)
-        
-        # Normalize marine data - use average of available sources
-        marine_df["timestamp"] = pd.to_datetime(marine_df["time"]).dt.tz_localize(None)
-        
-        # Calculate average wave height from all available sources
-        wave_cols = [col for col in marine_df.columns if col.startswith("waveHeight.")]
-        marine_df["waveHeight"] = marine_df[wave_cols].mean(axis=1)
-        
-        # Calculate average wave direction from all available sources
-        wave_dir_cols = [col for col in marine_df.columns if col.startswith("waveDirection.")]
-        marine_df["waveDirection"] = marine_df[wave_dir_cols].mean(axis=1)
-        
-        # Calculate average sea level
-        sea_level_cols = [col for col in marine_df.columns if col.startswith("seaLevel.")]
-        if len(sea_level_cols) > 0:
-            marine_df["seaLevel"] = marine_df[sea_level_cols].mean(axis=1)
-        else:
-            marine_df["seaLevel"] = 0.0
-        
-        marine_df = marine_df[["timestamp", "waveHeight", "waveDirection", "seaLevel"]]
-        
-        return weather_df, marine_df
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error loading data: {str(e)}")
 
+def iso_times(df) -> list:
+    return df["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%S").tolist()
 
 
-def merge_data(weather_df, marine_df):
-    """Merge weather and marine data on timestamp with 1-hour tolerance."""
-    # Sort both dataframes by timestamp
-    weather_df = weather_df.sort_values("timestamp")
-    marine_df = marine_df.sort_values("timestamp")
-    
-    # Merge with tolerance of 1 hour
-    merged_df = pd.merge_asof(
-        weather_df,
-        marine_df,
-        on="timestamp",
-        direction="nearest",
-        tolerance=pd.Timedelta("1h")
-    )
-    
-    # Drop rows with missing critical data
-    merged_df = merged_df.dropna(subset=["waveHeight", "windSpeed", "pop"])
-    
-    return merged_df
+def rounded(df, column: str, digits: int) -> list:
+    """Column values rounded for the response, with None for missing values."""
+    values = df[column].astype(float).round(digits)
+    return values.astype(object).where(values.notna(), None).tolist()
 
 
-def compute_derived_metrics(df):
-    """Compute risk score, cross angle, and storm flag."""
-    # Risk score formula: 0.4*(waveHeight/3) + 0.3*(windSpeed/10) + 0.3*(rainProb)
-    df["risk_score"] = (
-        0.4 * (df["waveHeight"] / 3.0) +
-        0.3 * (df["windSpeed"] / 10.0) +
-        0.3 * df["pop"]
-    )
-    
-    # Cross angle: absolute difference between wave direction and wind direction
-    df["cross_angle"] = (df["waveDirection"] - df["windDeg"]).abs()
-    
-    # Normalize cross_angle to 0-180 range
-    df["cross_angle"] = df["cross_angle"].apply(lambda x: min(x, 360 - x) if x > 180 else x)
-    
-    # Storm flag: risk_score > 0.7
-    df["storm_flag"] = df["risk_score"] > 0.7
-    
-    # Risk levels
-    def get_risk_level(score):
-        if score > 0.7:
-            return 'Dangerous'
-        elif score > 0.5:
-            return 'High'
-        elif score > 0.3:
-            return 'Moderate'
-        else:
-            return 'Safe'
-    
-    df["risk_level"] = df["risk_score"].apply(get_risk_level)
-    
-    return df
+def target_points(df, points, resolution):
+    """Number of points a chart asked for, either directly or as one point per resolution interval."""
+    if resolution is not None:
+        import pandas as pd  # loaded on first use, see warmup.py
+
+        try:
+            step = pd.Timedelta(resolution)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid resolution: {resolution}")
+        if step <= pd.Timedelta(0):
+            raise HTTPException(status_code=400, detail="resolution must be positive")
+        if df.empty:
+            return None
+        span = df["timestamp"].max() - df["timestamp"].min()
+        by_resolution = math.floor(span / step) + 1
+        points = by_resolution if points is None else min(points, by_resolution)
+    return points
+
+
+def cached_downsampled(key, build):
+    """Return the cached response for key under the current forecast version, building it on a miss."""
+    version = forecast.current_version()
+    if _downsampled_cache["version"] != version:
+        _downsampled_cache.update(version=version, responses={})
+    responses = _downsampled_cache["responses"]
+    if key in responses:
+        return responses[key]
+    if len(responses) >= MAX_DOWNSAMPLED_RESPONSES:
+        responses.clear()
+    responses[key] = response = build()
+    return response
 
 
 @router.get("/insights", response_model=RotterdamInsightsResponse)
-async def get_rotterdam_insights():
+def get_rotterdam_insights():
     """
     Get maritime risk insights for Rotterdam port.
     
-    Analyzes weather and marine data to compute:
-    - Risk scores based on wave height, wind speed, and precipitation probability
+    Reads the hourly risk table (see risk.py) for:
+    - Risk scores based on wave height, wind speed, visibility and wind/wave cross angle
     - Cross angles between wave and wind directions
     - Storm warnings when conditions are hazardous
     
     Returns hourly insights and summary statistics.
     """
-    # Load and normalize data
-    weather_df, marine_df = load_and_normalize_data()
-    
-    # Merge the datasets
-    merged_df = merge_data(weather_df, marine_df)
-    
-    # Compute derived metrics
-    result_df = compute_derived_metrics(merged_df)
+    result_df = risk_table().frame
     
     # Create insights list
-    insights = []
-    for _, row in result_df.iterrows():
-        insight = HourlyInsight(
-            time=row["timestamp"].isoformat(),
-            waveHeight=round(float(row["waveHeight"]), 2),
-            windSpeed=round(float(row["windSpeed"]), 2),
-            pop=round(float(row["pop"]), 2),
-            risk_score=round(float(row["risk_score"]), 3),
-            cross_angle=round(float(row["cross_angle"]), 2),
-            storm_flag=bool(row["storm_flag"]),
-            temperature=round(float(row["temperature"]), 2) if pd.notna(row["temperature"]) else None,
-            pressure=round(float(row["pressure"]), 2) if pd.notna(row["pressure"]) else None,
-            seaLevel=round(float(row["seaLevel"]), 2) if pd.notna(row["seaLevel"]) else None
-        )
-        insights.append(insight)
+    insights = [
+        HourlyInsight(time=time, waveHeight=wave_height, windSpeed=wind_speed, pop=pop, risk_score=risk_score,
+                      cross_angle=cross_angle, storm_flag=storm_flag, temperature=temperature,
+                      pressure=pressure, seaLevel=sea_level)
+        for time, wave_height, wind_speed, pop, risk_score, cross_angle, storm_flag, temperature, pressure, sea_level
+        in zip(iso_times(result_df), rounded(result_df, "waveHeight", 2), rounded(result_df, "windSpeed", 2),
+               rounded(result_df, "pop", 2), rounded(result_df, "risk_score", 3), rounded(result_df, "cross_angle", 2),
+               result_df["storm_flag"].tolist(), rounded(result_df, "temperature", 2),
+               rounded(result_df, "pressure", 2), rounded(result_df, "seaLevel", 2))
+    ]
     
     # Compute summary statistics
     max_risk_idx = result_df["risk_score"].idxmax()
@@ -185,36 +116,53 @@ async def get_rotterdam_insights():
 
 
 @router.get("/risk-timeline", response_model=RiskTimelineResponse)
-async def get_risk_timeline():
+def get_risk_timeline(
+    points: Annotated[Optional[int], Query(ge=3)] = None,
+    resolution: Optional[str] = None,
+    method: Literal["minmax", "lttb"] = "minmax"
+):
     """
     Get risk timeline data for Chart.js line chart.
     
     Returns time series of risk scores with storm flags.
     Perfect for plotting risk over time with danger zones.
+
+    Long forecasts can be downsampled with `points` (e.g. 300) or `resolution` (e.g. "3h");
+    the default minmax method keeps the peak of every interval, lttb keeps the chart's shape.
+    `points` is an upper bound: minmax may return fewer rows when extremes coincide.
     """
     # Load and process data
-    weather_df, marine_df = load_and_normalize_data()
-    merged_df = merge_data(weather_df, marine_df)
-    result_df = compute_derived_metrics(merged_df)
+    table = risk_table()
+    if points is None and resolution is None:
+        return build_risk_timeline(table.frame)
+    return cached_downsampled(("risk-timeline", points, resolution, method),
+                              lambda: build_risk_timeline(table.frame, points, resolution, method))
+
+
+def build_risk_timeline(result_df, points=None, resolution=None, method="minmax"):
+    points = target_points(result_df, points, resolution)
+    result_df = downsample(result_df, points, ["risk_score"], method)
     
     # Create timeline data
-    timeline = []
-    for _, row in result_df.iterrows():
-        timeline.append(TimelineDataPoint(
-            time=row["timestamp"].isoformat(),
-            risk_score=round(float(row["risk_score"]), 3),
-            is_storm=bool(row["storm_flag"])
-        ))
+    timeline = [
+        TimelineDataPoint(time=time, risk_score=risk_score, is_storm=is_storm)
+        for time, risk_score, is_storm
+        in zip(iso_times(result_df), rounded(result_df, "risk_score", 3), result_df["storm_flag"].tolist())
+    ]
     
     return RiskTimelineResponse(
         city="Rotterdam",
         timeline=timeline,
-        storm_threshold=0.7
+        storm_threshold=STORM_THRESHOLD
     )
 
 
 @router.get("/multi-metric", response_model=MultiMetricResponse)
-async def get_multi_metric():
+def get_multi_metric(
+    points: Annotated[Optional[int], Query(ge=3)] = None,
+    resolution: Optional[str] = None,
+    method: Literal["minmax", "lttb"] = "minmax"
+):
     """
     Get wave, wind, and rain data for multi-metric dashboard.
     
@@ -224,21 +172,30 @@ async def get_multi_metric():
     - Rain probability (%)
     
     Includes threshold values for danger zones.
+
+    Downsampling works as for /risk-timeline, with `points` as an upper bound; minmax keeps the
+    extremes of all three series (below 8 points, the endpoints and as many extremes as fit,
+    wave height first), lttb follows the wave height series.
     """
     # Load and process data
-    weather_df, marine_df = load_and_normalize_data()
-    merged_df = merge_data(weather_df, marine_df)
-    result_df = compute_derived_metrics(merged_df)
+    table = risk_table()
+    if points is None and resolution is None:
+        return build_multi_metric(table.frame)
+    return cached_downsampled(("multi-metric", points, resolution, method),
+                              lambda: build_multi_metric(table.frame, points, resolution, method))
+
+
+def build_multi_metric(result_df, points=None, resolution=None, method="minmax"):
+    points = target_points(result_df, points, resolution)
+    result_df = downsample(result_df, points, ["waveHeight", "windSpeed", "pop"], method)
     
     # Create multi-metric data
-    data = []
-    for _, row in result_df.iterrows():
-        data.append(MultiMetricDataPoint(
-            time=row["timestamp"].isoformat(),
-            waveHeight=round(float(row["waveHeight"]), 2),
-            windSpeed=round(float(row["windSpeed"]), 2),
-            rainProbability=round(float(row["pop"] * 100), 1)
-        ))
+    data = [
+        MultiMetricDataPoint(time=time, waveHeight=wave_height, windSpeed=wind_speed, rainProbability=rain)
+        for time, wave_height, wind_speed, rain
+        in zip(iso_times(result_df), rounded(result_df, "waveHeight", 2), rounded(result_df, "windSpeed", 2),
+               (result_df["pop"] * 100).round(1).tolist())
+    ]
     
     return MultiMetricResponse(
         city="Rotterdam",
@@ -252,7 +209,7 @@ async def get_multi_metric():
 
 
 @router.get("/risk-distribution", response_model=RiskDistributionResponse)
-async def get_risk_distribution():
+def get_risk_distribution():
     """
     Get risk level distribution for pie/donut charts.
     
@@ -262,10 +219,7 @@ async def get_risk_distribution():
     - High (0.5 ≤ risk < 0.7)
     - Dangerous (risk ≥ 0.7)
     """
-    # Load and process data
-    weather_df, marine_df = load_and_normalize_data()
-    merged_df = merge_data(weather_df, marine_df)
-    result_df = compute_derived_metrics(merged_df)
+    result_df = risk_table().frame
     
     # Count risk levels
     risk_counts = result_df["risk_level"].value_counts().to_dict()
@@ -294,3 +248,24 @@ async def get_risk_distribution():
         total_hours=total,
         percentages=percentages
     )
+
+
+@router.get("/congestion", response_model=CongestionResponse)
+async def get_congestion(hours: Annotated[int, Query(ge=1, le=120)] = 48):
+    """
+    Get expected vessel arrivals at Rotterdam per hour for stacked bar charts.
+    
+    Counts port-bound ships (longer than 60m) by the hour of their AIS ETA, split by
+    docking status (DOCK, DELAY, NO_DOCK) and ship type (cargo, tanker, passenger, other).
+    Built from the live vessel stream of this server, so it covers the ships it has seen.
+    """
+    port = "ROTTERDAM"
+    totals = vessel_hub.congestion.status_totals(port)
+    
+    return CongestionResponse(
+        city="Rotterdam",
+        hours=[CongestionHour(**hour) for hour in vessel_hub.congestion.forecast(port, hours)],
+        inbound=sum(totals.values()),
+        delayed=totals.get("DELAY", 0) + totals.get("NO_DOCK", 0),
+        by_status=totals
+    )
@@ -0,0 +1,61 @@
+import tempfile
+import time
+from pathlib import Path
+
+import pandas  # loaded lazily by the backend; imported here so it is not timed as part of a request
+
+import analysis_router
+import forecast
+from benchmarks.common import latency_summary, write_forecast_files
+
+# The /rotterdam handlers are called directly, so routing, middleware (admission control, CORS)
+# and HTTP transfer are not part of these timings
+
+# Forecast horizons in hours mapped to the number of timed requests; the current 5-day
+# Stormglass/OpenWeatherMap files cover ~120 hours
+FORECAST_SIZES = {120: 30, 1200: 20, 12000: 10}
+
+ENDPOINTS = {
+    "insights": analysis_router.get_rotterdam_insights,
+    "risk-timeline": analysis_router.get_risk_timeline,
+    "multi-metric": analysis_router.get_multi_metric,
+    "risk-distribution": analysis_router.get_risk_distribution,
+}
+
+
+def measure_endpoint(endpoint, repeats: int) -> list[float]:
+    """
+    Steady state latencies of an endpoint including serialization of its response model. One
+    untimed call first takes the forecast reload, which otherwise lands in p99 or not depending
+    on which suites ran before.
+    """
+    endpoint().model_dump_json()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        response = endpoint()
+        response.model_dump_json()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run() -> dict:
+    results = {}
+    original_base_dir = forecast.BASE_DIR
+    try:
+        for hours, repeats in FORECAST_SIZES.items():
+            with tempfile.TemporaryDirectory() as tmp:
+                write_forecast_files(Path(tmp), hours)
+                forecast.BASE_DIR = Path(tmp)
+                for name, endpoint in ENDPOINTS.items():
+                    samples = measure_endpoint(endpoint, repeats)
+                    for stat, value in latency_summary(samples).items():
+                        results[f"rotterdam_handler.{name}.{hours}h.{stat}"] = value
+    finally:
+        forecast.BASE_DIR = original_base_dir
+    return results
+
+
+if __name__ == "__main__":
+    for metric, value in run().items():
+        print(f"{metric}: {value}")
@@ -0,0 +1,60 @@
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import write_forecast_files
+
+# Cold-start cost of a fresh backend process, as paid by autoscaled or restarted instances: the
+# time to import main.py, and the latency of the first /rotterdam request with and without the
+# lifespan warm-up having run. Every sample is a new interpreter, so module caches start empty.
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+REPEATS = 5
+
+# Runs inside the child interpreter; prints its timings as one JSON line
+CHILD_SCRIPT = """
+import asyncio, contextlib, io, json, sys, time
+from pathlib import Path
+start = time.perf_counter()
+import main
+timings = {"import_main": time.perf_counter() - start}
+import analysis_router, forecast, warmup
+forecast.BASE_DIR = Path(sys.argv[1])
+with contextlib.redirect_stdout(io.StringIO()):
+    if sys.argv[2] == "warm":
+        start = time.perf_counter()
+        asyncio.run(warmup.warm_up(retry=False))
+        timings["warm_up"] = time.perf_counter() - start
+    start = time.perf_counter()
+    analysis_router.get_rotterdam_insights().model_dump_json()
+    timings["first_request"] = time.perf_counter() - start
+print(json.dumps(timings))
+"""
+
+
+def measure_process(forecast_dir: Path, mode: str) -> dict:
+    """Timings in seconds of one fresh interpreter, mode "cold" or "warm"."""
+    output = subprocess.run([sys.executable, "-c", CHILD_SCRIPT, str(forecast_dir), mode], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run() -> dict:
+    samples = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        write_forecast_files(Path(tmp), 120)
+        for mode in ("cold", "warm"):
+            for _ in range(REPEATS):
+                for name, seconds in measure_process(Path(tmp), mode).items():
+                    key = f"first_request.{mode}" if name == "first_request" else name
+                    samples.setdefault(key, []).append(seconds)
+    return {f"coldstart.{name}.median_ms": round(statistics.median(values) * 1000, 3)
+            for name, values in samples.items()}
+
+
+if __name__ == "__main__":
+    for metric, value in run().items():
+        print(f"{metric}: {value}")
@@ -0,0 +1,67 @@
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from data.vessel_hub import VesselHub
+from benchmarks.common import latency_summary, quiet, replay_stream, write_ais_corpus
+
+# Fan-out inside VesselHub: every subscriber is an in-process consumer of the hub's generator that
+# serializes updates like WebSocket.send_json, so socket writes and the ASGI server are not timed
+
+CLIENT_COUNTS = [1, 100, 1000]
+
+
+class TimedHub(VesselHub):
+    """VesselHub that stamps every update with the time it was published."""
+
+    def __init__(self):
+        super().__init__(socket_path=None, track_store=None)
+        self.reconnect = False  # end the run when the replay finishes
+        self.published_at = {}
+        self.published = 0
+
+    def publish(self, update):
+        if isinstance(update, dict):
+            self.published_at[id(update["ship"])] = (update["ship"], time.perf_counter())
+            self.published += 1
+        super().publish(update)
+
+
+async def simulated_client(hub: TimedHub, latencies: list[float]):
+    """Consume the filtered ship stream, serializing each update like WebSocket.send_json does."""
+    try:
+        async for ship_data in hub.filtered_ships():
+            json.dumps(ship_data)
+            latencies.append(time.perf_counter() - hub.published_at[id(ship_data)][1])
+    except ConnectionError:
+        pass
+
+
+async def measure_fanout(corpus_path: str, clients: int) -> dict:
+    hub = TimedHub()
+    latencies = []
+    async with replay_stream(corpus_path, speed=1.0):
+        await asyncio.gather(*(simulated_client(hub, latencies) for _ in range(clients)))
+
+    expected = hub.published * clients
+    summary = latency_summary(latencies)
+    summary["delivered_ratio"] = round(len(latencies) / expected, 4) if expected else 0.0
+    return summary
+
+
+def run() -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, quiet():
+        corpus_path = str(Path(tmp) / "corpus.jsonl.gz")
+        write_ais_corpus(corpus_path, ships=200, positions=2000, interval=0.002)
+        for clients in CLIENT_COUNTS:
+            for stat, value in asyncio.run(measure_fanout(corpus_path, clients)).items():
+                results[f"hub_fanout.{clients}_subscribers.{stat}"] = value
+    return results
+
+
+if __name__ == "__main__":
+    for metric, value in run().items():
+        print(f"{metric}: {value}")
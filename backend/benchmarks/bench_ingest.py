@@ -0,0 +1,63 @@
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+import data.vessel as vessel
+import risk
+from ship_analysis import assess_ship_docking
+from benchmarks.common import quiet, replay_stream, write_ais_corpus
+
+
+async def _drain(generator) -> int:
+    count = 0
+    async for _ in generator:
+        count += 1
+    return count
+
+
+async def measure_generator(corpus_path: str, message_count: int, make_generator) -> float:
+    """Messages per second a vessel generator decodes from a max speed replay of the corpus."""
+    async with replay_stream(corpus_path):
+        start = time.perf_counter()
+        await _drain(make_generator())
+        elapsed = time.perf_counter() - start
+    return message_count / elapsed
+
+
+def measure_assess_ship_docking(duration: float = 2.0) -> float:
+    """assess_ship_docking calls per second over a spread of ETAs inside the forecast window."""
+    risk.risk_table()  # built in the background on the stream, up front here
+    etas = [{"Month": 0, "Day": day, "Hour": hour, "Minute": 0} for day in range(5) for hour in range(0, 24, 3)]
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        assess_ship_docking(etas[calls % len(etas)])
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+
+def run() -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, quiet():
+        corpus_path = str(Path(tmp) / "corpus.jsonl.gz")
+        message_count = write_ais_corpus(corpus_path)
+
+        generators = {
+            "stream_vessel_updates": lambda: vessel.stream_vessel_updates(reconnect=False),
+            "predict_port_bound_ships": lambda: vessel.predict_port_bound_ships(
+                bounding_box=vessel.GLOBAL_BOUNDING_BOX, port="ROTTERDAM"),
+            "get_filtered_ships": lambda: vessel.get_filtered_ships(bounding_box=vessel.GLOBAL_BOUNDING_BOX),
+        }
+        for name, make_generator in generators.items():
+            rate = asyncio.run(measure_generator(corpus_path, message_count, make_generator))
+            results[f"ingest.{name}.messages_per_sec"] = round(rate, 1)
+
+        results["risk.assess_ship_docking.calls_per_sec"] = round(measure_assess_ship_docking(), 1)
+
+    return results
+
+
+if __name__ == "__main__":
+    for metric, value in run().items():
+        print(f"{metric}: {value}")
@@ -0,0 +1,133 @@
+import contextlib
+import json
+import math
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+import websockets
+
+import data.vessel as vessel
+from data.ais_recording import RecordingWriter
+from replay_ais import ReplayServer
+
+PORTS = ["ROTTERDAM", "HAMBURG", "ANTWERP"]
+
+
+def percentile(samples: list[float], p: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(p / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def latency_summary(samples: list[float]) -> dict:
+    """Summarize latencies given in seconds as p50/p99 milliseconds."""
+    return {
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the per-message prints of the code under test so terminal I/O does not skew timings."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+@contextlib.asynccontextmanager
+async def replay_stream(path: str, speed: float = 0.0):
+    """Serve a recording on an ephemeral local port and point the vessel generators at it."""
+    replay = ReplayServer(path, speed=speed)
+    async with websockets.serve(replay.handler, "localhost", 0, max_size=None) as server:
+        port = server.sockets[0].getsockname()[1]
+        previous_url = vessel.AIS_STREAM_URL
+        vessel.AIS_STREAM_URL = f"ws://localhost:{port}/v0/stream"
+        try:
+            yield replay
+        finally:
+            vessel.AIS_STREAM_URL = previous_url
+
+
+def write_ais_corpus(path: str, ships: int = 500, positions: int = 20000, interval: float = 0.001, seed: int = 42) -> int:
+    """
+    Write a deterministic synthetic AIS recording: one ShipStaticData per ship followed by
+    PositionReports spaced interval seconds apart. Returns the number of messages written.
+    """
+    rng = random.Random(seed)
+    t = 0.0
+    with RecordingWriter(path) as writer:
+        for mmsi in range(200000000, 200000000 + ships):
+            length = rng.choice([40, 80, 150, 300])
+            writer.write(json.dumps({
+                "MessageType": "ShipStaticData",
+                "MetaData": {"MMSI": mmsi, "ShipName": f"SHIP {mmsi}", "latitude": 51.9, "longitude": 4.0},
+                "Message": {"ShipStaticData": {
+                    "UserID": mmsi,
+                    "Name": f"SHIP {mmsi}",
+                    "CallSign": f"C{mmsi % 10000}",
+                    "Type": rng.choice([70, 80, 60]),
+                    "Destination": rng.choice(PORTS),
+                    "Dimension": {"A": length // 2, "B": length // 2, "C": 10, "D": 10},
+                    "Eta": {"Month": 0, "Day": rng.randint(0, 4), "Hour": rng.randint(0, 23), "Minute": 0},
+                }},
+            }), t)
+
+        for i in range(positions):
+            t += interval
+            mmsi = 200000000 + rng.randrange(ships)
+            latitude = 50 + rng.random() * 5
+            longitude = rng.random() * 8
+            writer.write(json.dumps({
+                "MessageType": "PositionReport",
+                "MetaData": {"MMSI": mmsi, "ShipName": f"SHIP {mmsi}", "latitude": latitude, "longitude": longitude,
+                             "time_utc": "2025-11-02 03:00:00.000000 +0000 UTC"},
+                "Message": {"PositionReport": {
+                    "UserID": mmsi, "Latitude": latitude, "Longitude": longitude,
+                    "Sog": round(rng.random() * 20, 1), "Cog": round(rng.random() * 360, 1),
+                    "TrueHeading": rng.randrange(360), "NavigationalStatus": 0,
+                }},
+            }), t)
+
+    return ships + positions
+
+
+def write_forecast_files(directory, hours: int, seed: int = 42):
+    """
+    Write synthetic weather_data.json (3-hourly) and marine_data.json (hourly) files covering
+    the given number of hours, in the same shape as the OpenWeatherMap and Stormglass responses.
+    """
+    rng = random.Random(seed)
+    start = datetime(2025, 11, 2, tzinfo=timezone.utc)
+
+    weather = {"list": []}
+    for h in range(0, hours, 3):
+        ts = start + timedelta(hours=h)
+        weather["list"].append({
+            "dt": int(ts.timestamp()),
+            "dt_txt": ts.strftime("%Y-%m-%d %H:%M:%S"),
+            "main": {"temp": 280 + rng.random() * 10, "pressure": 1000 + rng.randint(0, 30)},
+            "wind": {"speed": rng.random() * 20, "deg": rng.randrange(360)},
+            "visibility": rng.choice([10000, 8000, 3000]),
+            "pop": round(rng.random(), 2),
+        })
+
+    marine = {"hours": []}
+    for h in range(hours):
+        ts = start + timedelta(hours=h)
+        marine["hours"].append({
+            "time": ts.isoformat(),
+            "waveHeight": {source: round(rng.random() * 5, 2) for source in ["ecmwf", "fcoo", "metno", "sg"]},
+            "waveDirection": {source: round(rng.random() * 360, 2) for source in ["ecmwf", "fcoo", "metno", "sg"]},
+            "currentSpeed": {source: round(rng.random(), 2) for source in ["ecmwf", "metno", "sg"]},
+            "currentDirection": {source: round(rng.random() * 360, 2) for source in ["ecmwf", "metno", "sg"]},
+            "seaLevel": {"meto": round(rng.random(), 2), "sg": round(rng.random(), 2)},
+        })
+
+    with open(directory / "weather_data.json", "w") as f:
+        json.dump(weather, f)
+    with open(directory / "marine_data.json", "w") as f:
+        json.dump(marine, f)
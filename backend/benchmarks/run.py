@@ -0,0 +1,92 @@
+import argparse
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks import bench_analytics, bench_coldstart, bench_fanout, bench_ingest
+
+# Runs the benchmark suite and compares it against the stored baselines. From the backend directory:
+#   python -m benchmarks.run                 # run everything and compare against baselines.json
+#   python -m benchmarks.run --save          # run everything and overwrite baselines.json
+#   python -m benchmarks.run --only ingest   # run a single suite
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines.json"
+
+# Latencies that moved by less than this many milliseconds are not regressions, whatever the
+# relative change: sub-millisecond metrics otherwise fail on scheduling noise alone
+ABSOLUTE_FLOOR_MS = 0.5
+
+SUITES = {
+    "ingest": bench_ingest.run,
+    "analytics": bench_analytics.run,
+    "fanout": bench_fanout.run,
+    "coldstart": bench_coldstart.run,
+}
+
+
+def higher_is_better(metric: str) -> bool:
+    return metric.endswith("_per_sec") or metric.endswith("_ratio")
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float, floor_ms: float = ABSOLUTE_FLOOR_MS) -> list[str]:
+    """List metrics that got worse than the baseline by more than tolerance (relative) and, for latencies, floor_ms."""
+    regressions = []
+    for metric, value in results.items():
+        expected = baseline.get(metric)
+        if not expected:
+            continue
+        if metric.endswith("_ms") and abs(value - expected) < floor_ms:
+            continue
+        change = (value - expected) / expected
+        if higher_is_better(metric):
+            change = -change
+        if change > tolerance:
+            regressions.append(f"{metric}: {value} (baseline {expected}, {change:+.0%} worse)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the backend benchmark suite")
+    parser.add_argument("--only", choices=SUITES.keys(), action="append", help="Suite(s) to run (default: all)")
+    parser.add_argument("--save", action="store_true", help="Store the results as the new baselines")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression (default: 0.25)")
+    parser.add_argument("--floor-ms", type=float, default=ABSOLUTE_FLOOR_MS,
+                        help=f"Ignore latency changes smaller than this (default: {ABSOLUTE_FLOOR_MS} ms)")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or SUITES.keys():
+        print(f"Running {name} benchmarks...")
+        suite_results = SUITES[name]()
+        for metric, value in suite_results.items():
+            print(f"  {metric}: {value}")
+        results.update(suite_results)
+
+    baseline = {}
+    if BASELINE_PATH.exists():
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    if args.save:
+        baseline["metrics"] = {**baseline.get("metrics", {}), **results}
+        baseline["recorded_at"] = datetime.now(timezone.utc).isoformat()
+        baseline["python"] = platform.python_version()
+        baseline["machine"] = platform.machine()
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Saved baselines to {BASELINE_PATH}")
+        return
+
+    regressions = find_regressions(results, baseline.get("metrics", {}), args.tolerance, args.floor_ms)
+    if regressions:
+        print("Regressions against baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import argparse
+
+from dotenv import load_dotenv
+
+from data.forecast_grid import (FORECAST_GRID_DIR, GRID_MARINE_POINTS, GRID_RADIUS_DEGREES, GRID_STEP_DEGREES,
+                                build_port_grid)
+from ports import PORTS
+
+# Fetches the regional wind and wave forecast rasters used for en-route risk. Run it from cron
+# every few hours; the ingest picks up rebuilt grids without a restart:
+#   python build_forecast_grids.py ROTTERDAM HAMBURG --radius 2 --step 1
+# Every grid point costs one OpenWeatherMap request, and the --marine-points points nearest the
+# port one Stormglass request each (through the quota-aware gateways), so keep the grids coarse.
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Build forecast grids around ports for en-route risk")
+    parser.add_argument("ports", nargs="*", default=["ROTTERDAM"], choices=sorted(PORTS), metavar="PORT")
+    parser.add_argument("--radius", type=float, default=GRID_RADIUS_DEGREES, help="Degrees around the port")
+    parser.add_argument("--step", type=float, default=GRID_STEP_DEGREES, help="Grid spacing in degrees")
+    parser.add_argument("--marine-points", type=int, default=GRID_MARINE_POINTS,
+                        help="Stormglass requests per grid, for the points nearest the port")
+    args = parser.parse_args()
+
+    for port in args.ports:
+        path = build_port_grid(port, radius=args.radius, step=args.step, marine_points=args.marine_points)
+        print(f"Wrote {port} forecast grid to {path.parent}")
+    print(f"Grids in {FORECAST_GRID_DIR}")
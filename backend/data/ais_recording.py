@@ -0,0 +1,113 @@
+import gzip
+import json
+import time
+import zlib
+
+# AIS recordings are gzip compressed JSON lines of the form {"t": <receive time>, "msg": <raw message>}.
+# Every recording session appends a new gzip member, so files are append-only. A recorder that
+# crashes leaves its member without an end; the reader keeps everything up to its last flush,
+# then finds the start of the next session's member by its gzip header and carries on there.
+
+READ_CHUNK_SIZE = 1 << 16
+GZIP_MEMBER_HEADER = b"\x1f\x8b\x08"  # magic bytes and the deflate method
+
+
+class RecordingWriter:
+    """Appends raw AIS stream messages to a compressed recording file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        self.count = 0
+
+    def write(self, raw_message, received_at: float = None):
+        if isinstance(raw_message, bytes):
+            raw_message = raw_message.decode("utf-8")
+        record = {"t": received_at if received_at is not None else time.time(), "msg": raw_message}
+        self._file.write(json.dumps(record) + "\n")
+        self.count += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _find_member(f, start: int):
+    """Offset of the next gzip member header at or after start, or None."""
+    f.seek(start)
+    position, tail = start, b""
+    while True:
+        chunk = f.read(READ_CHUNK_SIZE)
+        if not chunk:
+            return None
+        data = tail + chunk
+        found = data.find(GZIP_MEMBER_HEADER)
+        if found >= 0:
+            return position - len(tail) + found
+        tail = data[-(len(GZIP_MEMBER_HEADER) - 1):]
+        position += len(chunk)
+
+
+def _read_lines(path: str):
+    """Decompressed lines of every gzip member, skipping over the damaged end of a crashed session."""
+    with open(path, "rb") as f:
+        offset = 0  # start of the current member
+        while offset is not None:
+            f.seek(offset)
+            decompressor = zlib.decompressobj(wbits=31)
+            pending = b""
+            position = previous = offset  # start of the chunk being decompressed, and of the one before
+            damaged = False
+            while not decompressor.eof:
+                chunk = f.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                checkpoint = decompressor.copy()
+                try:
+                    data = decompressor.decompress(chunk)
+                except zlib.error:
+                    # Salvage what decompresses before the damage, byte by byte
+                    data, damaged = b"", True
+                    for i in range(len(chunk)):
+                        try:
+                            data += checkpoint.decompress(chunk[i:i + 1])
+                        except zlib.error:
+                            break
+                lines = (pending + data).split(b"\n")
+                pending = lines.pop()
+                yield from lines
+                if damaged:
+                    break
+                previous, position = position, position + len(chunk)
+            if pending:
+                yield pending  # a truncated last line is dropped by the caller
+
+            if decompressor.eof:
+                offset = f.tell() - len(decompressor.unused_data)
+            elif damaged:
+                # Another session was appended after a crashed one: resume at its header
+                offset = _find_member(f, max(previous, offset + 1))
+            else:
+                offset = None  # the file ends inside a member
+
+
+def read_recording(path: str):
+    """Yield (received_at, raw_message) tuples from a recording in the order they were received."""
+    for line in _read_lines(path):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            # A recorder killed mid-write leaves a truncated last line
+            continue
+        yield record["t"], record["msg"]
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import os
+import time
+
+import websockets
+
+import metrics
+from ports import approach_box
+
+# Adaptive aisstream.io subscription. While somebody needs every ship (/ws/filtered_ships) the
+# stream stays global. When only port-bound ships are wanted, the subscription is narrowed to the
+# tracked MMSIs, or to the approach boxes of the watched ports once the tracked set outgrows
+# aisstream's MMSI filter limit. A periodic wide-net discovery pass picks up ShipStaticData of
+# vessels that have newly set course for a watched port.
+#
+# Known gap of approach mode: aisstream applies the MMSI filter and the bounding boxes together,
+# so one subscription cannot ask for "these ships anywhere, plus everything near the ports".
+# Tracked ships still outside the approach boxes go unheard until they enter one or a discovery
+# pass sees them; as they stay silent the hub forgets them, and once the tracked set is back
+# under the MMSI limit the subscription returns to following them individually.
+
+GLOBAL_BOUNDING_BOX = [[-90, -180], [90, 180]]
+
+# aisstream.io accepts at most 50 MMSIs in FiltersShipMMSI
+MAX_FILTER_MMSI = 50
+
+DISCOVERY_INTERVAL = float(os.getenv("AIS_DISCOVERY_INTERVAL", "600"))  # seconds between discovery passes
+DISCOVERY_DURATION = float(os.getenv("AIS_DISCOVERY_DURATION", "60"))  # seconds each pass stays wide
+RESUBSCRIBE_MIN_INTERVAL = float(os.getenv("AIS_RESUBSCRIBE_MIN_INTERVAL", "15"))  # debounce for tracked set churn
+CHECK_INTERVAL = 5.0  # seconds between subscription checks on an open connection
+
+RESUBSCRIPTIONS = metrics.Counter("ais_resubscriptions_total", "Upstream subscription changes by mode", ["mode"])
+TRACKED_PORT_BOUND = metrics.Gauge("ais_tracked_port_bound_vessels", "Port-bound vessels the subscription is narrowed to")
+
+
+class SubscriptionManager:
+    """Decides which aisstream.io subscription the ingest should hold at any moment."""
+
+    def __init__(self, api_key: str, message_types: list[str], wide_demand: bool = True, watched_ports=()):
+        self.api_key = api_key
+        self.message_types = message_types
+        self.wide_demand = wide_demand  # somebody needs every ship, not just port-bound ones
+        self.watched_ports = set(watched_ports)
+        self._port_bound = {}  # mmsi -> destination of every port-bound ship heard from recently
+        self._started_at = time.monotonic()
+        self._current = None
+        self._sent_at = float("-inf")
+
+    def track(self, mmsi: int, port_bound: bool, destination: str):
+        """Record the destination of a ship from its decoded ShipStaticData message."""
+        if port_bound:
+            self._port_bound[mmsi] = destination
+        else:
+            self._port_bound.pop(mmsi, None)
+
+    def forget(self, mmsi: int):
+        """Stop tracking a ship the ingest has not heard from for a while (see vessel_hub.prune_vessel_state)."""
+        self._port_bound.pop(mmsi, None)
+
+    def tracked(self) -> set[int]:
+        """MMSIs of port-bound ships heading to a watched port."""
+        return {mmsi for mmsi, destination in self._port_bound.items() if destination in self.watched_ports}
+
+    def in_discovery(self, now: float) -> bool:
+        return (now - self._started_at) % DISCOVERY_INTERVAL < DISCOVERY_DURATION
+
+    def mode(self, now: float, tracked: set[int]) -> str:
+        if self.wide_demand or not self.watched_ports or not tracked or self.in_discovery(now):
+            return "wide"
+        if len(tracked) <= MAX_FILTER_MMSI:
+            return "mmsi"
+        return "approach"
+
+    def build(self, now: float = None) -> dict:
+        """The subscription message the ingest should currently hold."""
+        now = time.monotonic() if now is None else now
+        tracked = self.tracked()
+        TRACKED_PORT_BOUND.set(len(tracked))
+        mode = self.mode(now, tracked)
+        bounding_boxes = [GLOBAL_BOUNDING_BOX]
+        filter_mmsi = None
+        if mode == "mmsi":
+            filter_mmsi = sorted(str(mmsi) for mmsi in tracked)
+        elif mode == "approach":
+            bounding_boxes = [box for box in map(approach_box, sorted(self.watched_ports)) if box] or [GLOBAL_BOUNDING_BOX]
+        return {"APIKey": self.api_key,
+                "BoundingBoxes": bounding_boxes,
+                "FiltersShipMMSI": filter_mmsi,
+                "FilterMessageTypes": self.message_types}
+
+    @staticmethod
+    def describe(subscription: dict) -> str:
+        if subscription["FiltersShipMMSI"] is not None:
+            return "mmsi"
+        if subscription["BoundingBoxes"] != [GLOBAL_BOUNDING_BOX]:
+            return "approach"
+        return "wide"
+
+    def initial(self) -> dict:
+        """Subscription to send right after connecting."""
+        self._current = self.build()
+        self._sent_at = time.monotonic()
+        RESUBSCRIPTIONS.labels(self.describe(self._current)).inc()
+        return self._current
+
+    def next_subscription(self, now: float = None):
+        """Return a new subscription message if the desired one changed and the debounce allows it, else None."""
+        now = time.monotonic() if now is None else now
+        desired = self.build(now)
+        if desired == self._current:
+            return None
+        # Mode switches (discovery passes, demand changes) apply at once; tracked set churn is debounced
+        if self.describe(desired) == self.describe(self._current) and now - self._sent_at < RESUBSCRIBE_MIN_INTERVAL:
+            return None
+        self._current = desired
+        self._sent_at = now
+        RESUBSCRIPTIONS.labels(self.describe(desired)).inc()
+        return desired
+
+    async def maintain(self, websocket):
+        """Keep the subscription of an open aisstream connection up to date. Run as a task."""
+        while True:
+            await asyncio.sleep(CHECK_INTERVAL)
+            subscription = self.next_subscription()
+            if subscription is not None:
+                print(f"Updating AIS subscription: {self.describe(subscription)}")
+                try:
+                    await websocket.send(json.dumps(subscription))
+                except websockets.ConnectionClosed:
+                    # The ingest reconnects and sends the then current subscription
+                    return
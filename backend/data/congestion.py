@@ -0,0 +1,130 @@
+import collections
+import os
+import time
+from datetime import datetime, timezone
+
+import metrics
+
+# Per-port, per-hour arrival counts of port-bound vessels, split by docking status and ship type,
+# maintained incrementally from the live vessel updates. Every update moves at most one vessel
+# between buckets, and vessels leave the aggregate once their arrival hour has passed or they
+# have not been heard from for CONGESTION_VESSEL_TTL, so queries never rescan the fleet.
+
+CONGESTION_VESSEL_TTL = float(os.getenv("CONGESTION_VESSEL_TTL", str(3 * 3600)))  # seconds
+
+CONGESTION_VESSELS = metrics.Gauge("congestion_forecast_vessels", "Port-bound vessels in the congestion forecast")
+
+SHIP_CATEGORIES = ("cargo", "tanker", "passenger", "other")
+
+
+def ship_category(ship_type: int) -> str:
+    """Coarse category of an AIS ship type code."""
+    if 70 <= ship_type <= 79:
+        return "cargo"
+    if 80 <= ship_type <= 89:
+        return "tanker"
+    if 60 <= ship_type <= 69:
+        return "passenger"
+    return "other"
+
+
+def _hour(timestamp: float) -> int:
+    return int(timestamp // 3600)
+
+
+class CongestionForecast:
+    """Incrementally maintained arrival buckets keyed by (port, hour since the epoch)."""
+
+    def __init__(self, vessel_ttl: float = CONGESTION_VESSEL_TTL):
+        self.vessel_ttl = vessel_ttl
+        # mmsi -> (port, eta_time, hour, status, category, seen_at), least recently seen first
+        self._vessels = collections.OrderedDict()
+        self._buckets = collections.defaultdict(collections.Counter)  # (port, hour) -> Counter[(status, category)]
+        self._by_hour = collections.defaultdict(set)  # hour -> mmsis arriving in it
+        self._status_totals = collections.defaultdict(collections.Counter)  # port -> Counter[status]
+        self._expired_before = None  # arrival hours below this have been expired
+
+    def update(self, ship_data: dict, port_bound: bool, now: float = None):
+        """Account for one vessel update (a ShipPositionData dict)."""
+        now = time.time() if now is None else now
+        mmsi = ship_data["mmsi"]
+        eta_time = ship_data.get("eta_time")
+        if not port_bound or not eta_time:
+            self.remove(mmsi)
+        else:
+            port, status = ship_data["destination"], ship_data.get("status") or "N/A"
+            category = ship_category(ship_data.get("ship_type") or 0)
+            current = self._vessels.get(mmsi)
+            if current is not None and current[:2] == (port, eta_time) and current[3:5] == (status, category):
+                # Same ETA and status, the common case: just refresh
+                self._vessels[mmsi] = current[:5] + (now,)
+                self._vessels.move_to_end(mmsi)
+            else:
+                hour = _hour(datetime.fromisoformat(eta_time).timestamp())
+                self.remove(mmsi)
+                if hour >= _hour(now):
+                    self._add(mmsi, (port, eta_time, hour, status, category, now))
+        self.expire(now)
+
+    def remove(self, mmsi: int):
+        entry = self._vessels.pop(mmsi, None)
+        if entry is None:
+            return
+        port, _, hour, status, category, _ = entry
+        bucket = self._buckets[(port, hour)]
+        bucket[(status, category)] -= 1
+        if bucket[(status, category)] <= 0:
+            del bucket[(status, category)]
+            if not bucket:
+                del self._buckets[(port, hour)]
+        self._by_hour[hour].discard(mmsi)
+        if not self._by_hour[hour]:
+            del self._by_hour[hour]
+        self._status_totals[port][status] -= 1
+        CONGESTION_VESSELS.set(len(self._vessels))
+
+    def expire(self, now: float = None):
+        """Drop vessels whose arrival hour has passed or that have gone silent."""
+        now = time.time() if now is None else now
+        current_hour = _hour(now)
+        if self._expired_before is None:
+            self._expired_before = current_hour
+        while self._expired_before < current_hour:
+            for mmsi in list(self._by_hour.get(self._expired_before, ())):
+                self.remove(mmsi)
+            self._expired_before += 1
+        while self._vessels:
+            mmsi, entry = next(iter(self._vessels.items()))
+            if now - entry[5] < self.vessel_ttl:
+                break
+            self.remove(mmsi)
+
+    def forecast(self, port: str, hours: int, now: float = None) -> list[dict]:
+        """Arrivals at port for each of the next hours, starting with the current hour."""
+        now = time.time() if now is None else now
+        self.expire(now)
+        first_hour = _hour(now)
+        result = []
+        for hour in range(first_hour, first_hour + hours):
+            by_status = collections.Counter()
+            by_ship_type = dict.fromkeys(SHIP_CATEGORIES, 0)
+            for (status, category), count in self._buckets.get((port, hour), {}).items():
+                by_status[status] += count
+                by_ship_type[category] += count
+            result.append({"time": datetime.fromtimestamp(hour * 3600, timezone.utc).isoformat(),
+                           "arrivals": sum(by_status.values()),
+                           "by_status": dict(by_status),
+                           "by_ship_type": by_ship_type})
+        return result
+
+    def status_totals(self, port: str) -> dict[str, int]:
+        """Inbound vessels per docking status over the whole forecast."""
+        return {status: count for status, count in self._status_totals.get(port, {}).items() if count > 0}
+
+    def _add(self, mmsi: int, entry: tuple):
+        port, _, hour, status, category, _ = entry
+        self._vessels[mmsi] = entry
+        self._buckets[(port, hour)][(status, category)] += 1
+        self._by_hour[hour].add(mmsi)
+        self._status_totals[port][status] += 1
+        CONGESTION_VESSELS.set(len(self._vessels))
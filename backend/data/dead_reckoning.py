@@ -0,0 +1,88 @@
+import math
+import os
+import time
+
+import metrics
+
+# Dead-band filtering of position updates. Each client keeps a dead-reckoning model of every
+# vessel from the last update it was sent (position, speed over ground, course over ground), and
+# the frontend extrapolates markers the same way. A new update is only sent when the reported
+# position drifts from that extrapolation by more than the dead band, when course, speed or
+# status change, or when a vessel has been silent for too long.
+
+DEAD_BAND_METERS = float(os.getenv("DEAD_BAND_METERS", "100"))  # 0 disables filtering
+DEAD_BAND_COURSE_DEGREES = float(os.getenv("DEAD_BAND_COURSE_DEGREES", "5"))
+DEAD_BAND_SPEED_KNOTS = float(os.getenv("DEAD_BAND_SPEED_KNOTS", "0.5"))
+DEAD_BAND_MAX_SILENCE = float(os.getenv("DEAD_BAND_MAX_SILENCE", "60"))  # seconds
+
+METERS_PER_DEGREE = 111320.0
+KNOTS_TO_MPS = 0.514444
+
+# AIS "not available" values for speed (102.3 kn) and course (360 deg)
+SPEED_NOT_AVAILABLE = 102.3
+COURSE_NOT_AVAILABLE = 360
+
+DEAD_BAND_UPDATES = metrics.Counter("dead_band_updates_total", "Position updates by dead-band decision", ["result"])
+_SENT = DEAD_BAND_UPDATES.labels("sent")
+_SUPPRESSED = DEAD_BAND_UPDATES.labels("suppressed")
+
+
+def extrapolate(latitude: float, longitude: float, speed: float, course: float, elapsed: float) -> tuple[float, float]:
+    """Dead-reckon a position forward by elapsed seconds at constant speed (knots) and course (degrees)."""
+    if speed <= 0 or speed >= SPEED_NOT_AVAILABLE or course >= COURSE_NOT_AVAILABLE:
+        return latitude, longitude
+    distance = speed * KNOTS_TO_MPS * elapsed
+    course_rad = math.radians(course)
+    d_lat = distance * math.cos(course_rad) / METERS_PER_DEGREE
+    d_lon = distance * math.sin(course_rad) / (METERS_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+    return latitude + d_lat, longitude + d_lon
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Equirectangular distance in meters, accurate at dead-band scale."""
+    x = (lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = lat2 - lat1
+    return math.hypot(x, y) * METERS_PER_DEGREE
+
+
+def _course_change(a: float, b: float) -> float:
+    diff = abs(a - b) % 360
+    return min(diff, 360 - diff)
+
+
+class DeadReckoningFilter:
+    """Per-client dead-band filter; call should_send for every update before sending it."""
+
+    def __init__(self, distance_m: float = DEAD_BAND_METERS, course_degrees: float = DEAD_BAND_COURSE_DEGREES,
+                 speed_knots: float = DEAD_BAND_SPEED_KNOTS, max_silence: float = DEAD_BAND_MAX_SILENCE):
+        self.distance_m = distance_m
+        self.course_degrees = course_degrees
+        self.speed_knots = speed_knots
+        self.max_silence = max_silence
+        self._last_sent = {}  # mmsi -> (sent_at, latitude, longitude, speed, course, nav_status, status)
+
+    def should_send(self, ship_data: dict, now: float = None) -> bool:
+        if self.distance_m <= 0:
+            return True
+        now = time.monotonic() if now is None else now
+        mmsi = ship_data["mmsi"]
+        latitude, longitude = ship_data["latitude"], ship_data["longitude"]
+        speed, course = ship_data["speed"], ship_data["course"]
+        nav_status, status = ship_data["nav_status"], ship_data.get("status")
+
+        last = self._last_sent.get(mmsi)
+        if last is not None:
+            sent_at, last_lat, last_lon, last_speed, last_course, last_nav_status, last_status = last
+            elapsed = now - sent_at
+            predicted_lat, predicted_lon = extrapolate(last_lat, last_lon, last_speed, last_course, elapsed)
+            if (elapsed < self.max_silence
+                    and nav_status == last_nav_status and status == last_status
+                    and abs(speed - last_speed) < self.speed_knots
+                    and _course_change(course, last_course) < self.course_degrees
+                    and distance_m(predicted_lat, predicted_lon, latitude, longitude) < self.distance_m):
+                _SUPPRESSED.inc()
+                return False
+
+        self._last_sent[mmsi] = (now, latitude, longitude, speed, course, nav_status, status)
+        _SENT.inc()
+        return True
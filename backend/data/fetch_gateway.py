@@ -0,0 +1,223 @@
+import contextlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import metrics
+
+# Gateway in front of the quota limited forecast APIs (Stormglass, OpenWeatherMap). Coordinates
+# are snapped to the centre of a grid cell, so nearby ports and repeated clicks share one upstream
+# request; concurrent identical requests wait for the one already in flight; results are cached
+# per cell for a TTL; and calls are refused before the provider's daily quota runs out, falling
+# back to the last cached result for the cell when there is one.
+#
+# The quota count, the cache and the in-flight markers live in a small SQLite file next to the
+# forecast files, so every uvicorn worker, ingest.py and build_forecast_grids.py draw on the same
+# daily allowance and see each other's results.
+
+FETCH_GATEWAY_DB = Path(os.getenv("FETCH_GATEWAY_DB", Path(__file__).resolve().parent.parent / "fetch_gateway.sqlite"))
+
+# How long another process's in-flight request is waited for before it is presumed dead
+IN_FLIGHT_TIMEOUT = 60.0  # seconds
+IN_FLIGHT_POLL_INTERVAL = 0.25
+
+# Cached results are kept this long past their TTL as a fallback once the quota is used up
+STALE_RETENTION = 2 * 24 * 3600  # seconds
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quota (provider TEXT PRIMARY KEY, day TEXT NOT NULL, used INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS cache (provider TEXT, key TEXT, fetched_at REAL NOT NULL, result TEXT NOT NULL,
+                                  PRIMARY KEY (provider, key));
+CREATE TABLE IF NOT EXISTS in_flight (provider TEXT, key TEXT, expires_at REAL NOT NULL, PRIMARY KEY (provider, key));
+"""
+
+GATEWAY_REQUESTS = metrics.Counter("fetch_gateway_requests_total", "Forecast fetches by provider and outcome",
+                                   ["provider", "result"])
+
+
+class QuotaExhausted(Exception):
+    """The provider's daily quota is used up and nothing is cached for the request."""
+
+    def __init__(self, provider: str, retry_after: int):
+        super().__init__(f"{provider} daily quota exhausted, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _seconds_until_utc_midnight(now: datetime) -> int:
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return math.ceil((tomorrow - now).total_seconds())
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.fetched_at = None
+        self.error = None
+
+
+class FetchGateway:
+    """Snapping, single-flight, TTL cache and daily quota accounting for one upstream provider."""
+
+    def __init__(self, provider: str, daily_quota: int, ttl: float, cell_degrees: float = 0.25, reserve: int = 0,
+                 db_path: Path = FETCH_GATEWAY_DB):
+        self.provider = provider
+        self.daily_quota = daily_quota
+        self.ttl = ttl
+        self.cell_degrees = cell_degrees
+        self.reserve = reserve  # requests only manual fetches may use, see fetch
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._cache = {}  # key -> (fetched_at, result), in front of the shared cache
+        self._in_flight: dict[tuple, _InFlight] = {}
+        metrics.Gauge(f"{provider}_quota_remaining", f"Requests left in today's {provider} quota", callback=self.remaining)
+
+    def snap(self, lat: float, lon: float) -> tuple[float, float]:
+        """Centre of the grid cell containing the coordinates."""
+        size = self.cell_degrees
+        return (round((math.floor(lat / size) + 0.5) * size, 6),
+                round((math.floor(lon / size) + 0.5) * size, 6))
+
+    def remaining(self) -> int:
+        """Requests left today. Read-only, so /metrics scrapes never wait for or block the write lock."""
+        try:
+            connection = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, timeout=1)
+        except sqlite3.OperationalError:
+            return self.daily_quota  # nothing fetched yet
+        try:
+            row = connection.execute("SELECT day, used FROM quota WHERE provider = ?", (self.provider,)).fetchone()
+        except sqlite3.OperationalError:
+            row = None  # database created but no schema yet
+        finally:
+            connection.close()
+        today = datetime.now(timezone.utc).date().isoformat()
+        used = row[1] if row is not None and row[0] == today else 0
+        return max(self.daily_quota - used, 0)
+
+    def record_usage(self, used: int, daily_quota: int = None):
+        """Sync the quota with counts reported by the provider itself."""
+        if daily_quota is not None:
+            self.daily_quota = daily_quota
+        with self._transaction() as db:
+            self._used(db, datetime.now(timezone.utc))  # starts a new day if needed
+            db.execute("UPDATE quota SET used = MAX(used, ?) WHERE provider = ?", (used, self.provider))
+
+    def fetch(self, key: tuple, request, manual: bool = False):
+        """
+        Return (result, fetched_at, source) for key, with source one of "cache", "shared",
+        "upstream" or "stale". request() performs the upstream call and is invoked at most once
+        at a time per key across all processes. Background callers leave the last `reserve`
+        requests of the day to manual ones (the forecast endpoints). Raises QuotaExhausted if
+        the quota forbids a call and nothing is cached.
+        """
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and time.time() - cached[0] < self.ttl:
+                GATEWAY_REQUESTS.labels(self.provider, "cache").inc()
+                return cached[1], cached[0], "cache"
+            in_flight = self._in_flight.get(key)
+            leader = in_flight is None
+            if leader:
+                in_flight = self._in_flight[key] = _InFlight()
+
+        if not leader:
+            # An identical request of this process is already on its way upstream, share its result
+            in_flight.done.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            GATEWAY_REQUESTS.labels(self.provider, "shared").inc()
+            return in_flight.result, in_flight.fetched_at, "shared"
+
+        try:
+            result, fetched_at, source = self._fetch_shared(key, request, manual)
+            with self._lock:
+                self._cache[key] = (fetched_at, result)
+            in_flight.result, in_flight.fetched_at = result, fetched_at
+            GATEWAY_REQUESTS.labels(self.provider, source).inc()
+            return result, fetched_at, source
+        except Exception as e:
+            in_flight.error = e
+            if not isinstance(e, QuotaExhausted):
+                GATEWAY_REQUESTS.labels(self.provider, "error").inc()
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            in_flight.done.set()
+
+    def _fetch_shared(self, key: tuple, request, manual: bool):
+        db_key = json.dumps(key)
+        limit = self.daily_quota if manual else self.daily_quota - self.reserve
+        while True:
+            with self._transaction() as db:
+                now = time.time()
+                row = db.execute("SELECT fetched_at, result FROM cache WHERE provider = ? AND key = ?",
+                                 (self.provider, db_key)).fetchone()
+                if row is not None and now - row[0] < self.ttl:
+                    return json.loads(row[1]), row[0], "cache"
+
+                lease = db.execute("SELECT expires_at FROM in_flight WHERE provider = ? AND key = ?",
+                                   (self.provider, db_key)).fetchone()
+                waiting = lease is not None and lease[0] > now
+                if not waiting:
+                    utc_now = datetime.now(timezone.utc)
+                    if self._used(db, utc_now) >= limit:
+                        if row is not None:
+                            return json.loads(row[1]), row[0], "stale"
+                        GATEWAY_REQUESTS.labels(self.provider, "refused").inc()
+                        raise QuotaExhausted(self.provider, _seconds_until_utc_midnight(utc_now))
+                    db.execute("UPDATE quota SET used = used + 1 WHERE provider = ?", (self.provider,))
+                    db.execute("INSERT OR REPLACE INTO in_flight VALUES (?, ?, ?)",
+                               (self.provider, db_key, now + IN_FLIGHT_TIMEOUT))
+            if not waiting:
+                break
+            # Another process is fetching the same key, its result will show up in the cache
+            time.sleep(IN_FLIGHT_POLL_INTERVAL)
+
+        try:
+            result = request()
+            fetched_at = time.time()
+            with self._transaction() as db:
+                db.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                           (self.provider, db_key, fetched_at, json.dumps(result)))
+                db.execute("DELETE FROM cache WHERE provider = ? AND fetched_at < ?",
+                           (self.provider, fetched_at - self.ttl - STALE_RETENTION))
+            return result, fetched_at, "upstream"
+        finally:
+            with self._transaction() as db:
+                db.execute("DELETE FROM in_flight WHERE provider = ? AND key = ?", (self.provider, db_key))
+
+    def _used(self, db: sqlite3.Connection, now: datetime) -> int:
+        # Provider quotas reset at midnight UTC
+        day = now.date().isoformat()
+        row = db.execute("SELECT day, used FROM quota WHERE provider = ?", (self.provider,)).fetchone()
+        if row is None or row[0] != day:
+            db.execute("INSERT OR REPLACE INTO quota VALUES (?, ?, 0)", (self.provider, day))
+            return 0
+        return row[1]
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Short write transaction on the shared database, serialized across processes."""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except QuotaExhausted:
+                connection.execute("COMMIT")
+                raise
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
@@ -0,0 +1,238 @@
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from data.dead_reckoning import extrapolate
+from data.fetch_gateway import QuotaExhausted
+from data.marine_ensemble import reduce_marine
+from data import tides_fetch, weather_fetch
+from ports import PORTS
+from risk import risk_kernel
+import metrics
+
+# Regional forecast rasters for en-route risk. build_forecast_grids.py fetches wind and wave
+# forecasts on a lat/lon grid around a port through the same gateways as the port forecast
+# endpoints, and stores them as an hourly (time, lat, lon, field) array. The ingest maps those
+# files read-only and samples them with trilinear interpolation along each vessel's
+# dead-reckoned path, so scoring a position report never touches the network.
+
+FORECAST_GRID_DIR = Path(os.getenv("FORECAST_GRID_DIR", Path(__file__).resolve().parent.parent / "forecast_grids"))
+GRID_RADIUS_DEGREES = float(os.getenv("FORECAST_GRID_RADIUS", "2.0"))
+GRID_STEP_DEGREES = float(os.getenv("FORECAST_GRID_STEP", "1.0"))
+GRID_HOURS = 120
+# Stormglass requests one grid build may spend, on the points nearest the port. The daily
+# Stormglass quota is 10, so a build must leave most of it to the marine forecast endpoint.
+GRID_MARINE_POINTS = int(os.getenv("FORECAST_GRID_MARINE_POINTS", "3"))
+ENROUTE_LOOKAHEAD_HOURS = int(os.getenv("ENROUTE_LOOKAHEAD_HOURS", "6"))
+GRID_RELOAD_INTERVAL = 60.0  # seconds between checks for rebuilt grid files
+
+FIELDS = ("windSpeed", "waveHeight")
+
+# (time, lat, lon) offsets of the eight corners of a grid cell
+_CORNERS = np.array([[dt, dlat, dlon] for dt in (0, 1) for dlat in (0, 1) for dlon in (0, 1)])
+
+_LOOKAHEAD_OFFSETS = np.arange(ENROUTE_LOOKAHEAD_HOURS + 1) * 3600.0
+_LOOKAHEAD_FRACTIONS = _LOOKAHEAD_OFFSETS / max(_LOOKAHEAD_OFFSETS[-1], 1.0)
+
+ENROUTE_LOOKUP_SECONDS = metrics.Histogram("enroute_risk_lookup_seconds", "Time to sample the forecast grids for one vessel",
+                                           buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01))
+
+
+class ForecastGrid:
+    """One memory-mapped regional forecast raster with trilinear sampling."""
+
+    def __init__(self, meta: dict, fields: np.ndarray):
+        self.port = meta["port"]
+        self.lat0, self.lon0, self.step = meta["lat0"], meta["lon0"], meta["step"]
+        self.t0, self.dt = meta["t0"], meta["dt"]
+        self.fields = fields  # (time, lat, lon, field)
+        n_t, n_lat, n_lon, _ = fields.shape
+        self.shape = (n_t, n_lat, n_lon)
+        self.bbox = (self.lat0, self.lon0, self.lat0 + (n_lat - 1) * self.step, self.lon0 + (n_lon - 1) * self.step)
+        # Plain ndarray view of the mapping; indexing a np.memmap directly is several times slower
+        self._flat = np.asarray(fields).reshape(n_t * n_lat * n_lon, -1)
+        self._strides = np.array([n_lat * n_lon, n_lon, 1])
+        self._last = np.array([[n_t - 1], [n_lat - 1], [n_lon - 1]], dtype=float)
+        self._last_lower = np.maximum(self._last - 1, 0)
+
+    @classmethod
+    def load(cls, meta_path: Path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return cls(meta, np.load(meta_path.with_suffix(".npy"), mmap_mode="r"))
+
+    def overlaps(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> bool:
+        return not (max_lat < self.bbox[0] or min_lat > self.bbox[2] or max_lon < self.bbox[1] or min_lon > self.bbox[3])
+
+    def sample(self, latitudes, longitudes, timestamps) -> np.ndarray:
+        """(n, field) values at the given points, NaN for points outside the grid in space or time."""
+        position = np.stack([(np.asarray(timestamps, dtype=float) - self.t0) / self.dt,
+                             (np.asarray(latitudes, dtype=float) - self.lat0) / self.step,
+                             (np.asarray(longitudes, dtype=float) - self.lon0) / self.step])  # (3, n)
+        inside = np.all((position >= 0) & (position <= self._last), axis=0)
+        lower = np.clip(np.floor(position), 0, self._last_lower).astype(int)
+        weight = np.clip(position - lower, 0.0, 1.0)
+
+        # All eight cell corners gathered at once from the flattened raster
+        corners = np.minimum(lower[None] + _CORNERS[:, :, None], self._last[None].astype(int))  # (8, 3, n)
+        values = self._flat[(corners * self._strides[None, :, None]).sum(axis=1)]  # (8, n, field)
+        weights = np.prod(np.where(_CORNERS[:, :, None], weight[None], 1 - weight[None]), axis=1)  # (8, n)
+        result = np.einsum("cn,cnf->nf", weights, values)
+        result[~inside] = np.nan
+        return result
+
+
+class ForecastGrids:
+    """The grids in FORECAST_GRID_DIR, reloaded when build_forecast_grids.py replaces them."""
+
+    def __init__(self, directory: Path = FORECAST_GRID_DIR):
+        self.directory = Path(directory)
+        self._grids = {}  # meta path -> (mtime_ns, ForecastGrid)
+        self._checked_at = float("-inf")
+
+    def grids(self, now: float = None) -> list[ForecastGrid]:
+        now = time.monotonic() if now is None else now
+        if now - self._checked_at >= GRID_RELOAD_INTERVAL:
+            self._checked_at = now
+            self._reload()
+        return [grid for _, grid in self._grids.values()]
+
+    def _reload(self):
+        found = {}
+        for meta_path in self.directory.glob("*.json"):
+            if meta_path.name.endswith(".tmp.json"):
+                continue  # being written by build_port_grid
+            try:
+                mtime = meta_path.stat().st_mtime_ns
+                current = self._grids.get(meta_path)
+                found[meta_path] = current if current and current[0] == mtime else (mtime, ForecastGrid.load(meta_path))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not load forecast grid {meta_path}: {e}")
+        self._grids = found
+
+    def enroute_risk(self, ship_data: dict, now: float = None):
+        """
+        Highest risk along the vessel's dead-reckoned path over the next ENROUTE_LOOKAHEAD_HOURS,
+        or None when no grid covers it.
+        """
+        grids = self.grids()
+        if not grids:
+            return None
+        with ENROUTE_LOOKUP_SECONDS.time():
+            now = time.time() if now is None else now
+            latitude, longitude = ship_data["latitude"], ship_data["longitude"]
+            # Dead reckoning is linear in time, so the hourly path points lie evenly between
+            # the current position and the one at the end of the lookahead
+            end_lat, end_lon = extrapolate(latitude, longitude, ship_data["speed"], ship_data["course"],
+                                           _LOOKAHEAD_OFFSETS[-1])
+            path_bbox = (min(latitude, end_lat), min(longitude, end_lon), max(latitude, end_lat), max(longitude, end_lon))
+            latitudes = latitude + (end_lat - latitude) * _LOOKAHEAD_FRACTIONS
+            longitudes = longitude + (end_lon - longitude) * _LOOKAHEAD_FRACTIONS
+            offsets = _LOOKAHEAD_OFFSETS
+
+            risk = None
+            for grid in grids:
+                if not grid.overlaps(*path_bbox):
+                    continue
+                values = grid.sample(latitudes, longitudes, now + offsets)
+                covered = ~np.all(np.isnan(values), axis=1)
+                if not covered.any():
+                    continue
+                values = np.nan_to_num(values[covered])
+                # Directions and precipitation are not gridded, so those terms are left out
+                scores, _ = risk_kernel(values[:, 0], 0.0, values[:, 1], 0.0, 10000)
+                risk = max(risk or 0.0, float(scores.max()))
+            return risk
+
+
+def _hourly(times: np.ndarray, values: np.ndarray, hours: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return np.full(len(hours), np.nan)
+    return np.interp(hours, times[valid], values[valid], left=np.nan, right=np.nan)
+
+
+def fetch_point(lat: float, lon: float, hours: np.ndarray, marine: bool = True) -> np.ndarray:
+    """
+    (hours, field) forecast for one grid point through the quota-aware gateways, NaN where
+    unavailable. Waves are only fetched when marine is set.
+    """
+    import requests  # loaded on first use, see warmup.py
+
+    # Upstream failures that leave the point unfilled rather than abort the build
+    point_errors = (QuotaExhausted, requests.RequestException, KeyError, ValueError)
+    series = np.full((len(hours), len(FIELDS)), np.nan)
+
+    cell = weather_fetch.WEATHER_GATEWAY.snap(lat, lon)
+    try:
+        weather, _, _ = weather_fetch.WEATHER_GATEWAY.fetch(cell, lambda: weather_fetch.fetch_port_weather(*cell))
+        times = np.array([entry["dt"] for entry in weather["list"]], dtype=float)
+        wind = np.array([entry["wind"]["speed"] for entry in weather["list"]], dtype=float)
+        series[:, 0] = _hourly(times, wind, hours)
+    except point_errors as e:
+        print(f"Skipping weather at {cell}: {e}")
+
+    if not marine:
+        return series
+    start = datetime.fromtimestamp(hours[0], timezone.utc).isoformat()
+    end = datetime.fromtimestamp(hours[-1], timezone.utc).isoformat()
+    cell = tides_fetch.MARINE_GATEWAY.snap(lat, lon)
+    try:
+        marine, _, _ = tides_fetch.MARINE_GATEWAY.fetch((cell, start[:10], end[:10]),
+                                                        lambda: tides_fetch.fetch_marine_stats(*cell, start, end))
+        stats = reduce_marine(marine["hours"])
+        times = stats["time"].astype("datetime64[s]").astype(float)
+        series[:, 1] = _hourly(times, stats["waveHeight.mean"], hours)
+    except point_errors as e:
+        print(f"Skipping marine forecast at {cell}: {e}")
+    return series
+
+
+def build_port_grid(port: str, radius: float = GRID_RADIUS_DEGREES, step: float = GRID_STEP_DEGREES,
+                    directory: Path = FORECAST_GRID_DIR, marine_points: int = GRID_MARINE_POINTS) -> Path:
+    """
+    Fetch and store the forecast raster around a port, replacing any previous one atomically.
+    Waves are fetched for at most marine_points points, the ones nearest the port.
+    """
+    info = PORTS[port]
+    latitudes = np.arange(info["latitude"] - radius, info["latitude"] + radius + 1e-9, step)
+    longitudes = np.arange(info["longitude"] - radius, info["longitude"] + radius + 1e-9, step)
+    t0 = int(time.time() // 3600 * 3600)
+    hours = t0 + np.arange(GRID_HOURS) * 3600.0
+
+    directory.mkdir(parents=True, exist_ok=True)
+    name = port.replace(" ", "_")
+    tmp_path = directory / f"{name}.tmp.npy"
+    points = sorted(((i, j) for i in range(len(latitudes)) for j in range(len(longitudes))),
+                    key=lambda p: (latitudes[p[0]] - info["latitude"]) ** 2 + (longitudes[p[1]] - info["longitude"]) ** 2)
+    try:
+        fields = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32,
+                                           shape=(GRID_HOURS, len(latitudes), len(longitudes), len(FIELDS)))
+        for rank, (i, j) in enumerate(points):
+            fields[:, i, j, :] = fetch_point(latitudes[i], longitudes[j], hours, marine=rank < marine_points)
+
+        # Points left out or failed take the mean of the fetched points at the same hour
+        with np.errstate(all="ignore"):
+            fill = np.nanmean(fields, axis=(1, 2), keepdims=True)
+        np.copyto(fields, np.broadcast_to(fill, fields.shape), where=np.isnan(fields))
+        fields.flush()
+        del fields
+        os.replace(tmp_path, directory / f"{name}.npy")
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    meta = {"port": port, "lat0": float(latitudes[0]), "lon0": float(longitudes[0]), "step": step,
+            "t0": t0, "dt": 3600, "fields": list(FIELDS), "built_at": datetime.now(timezone.utc).isoformat()}
+    meta_path = directory / f"{name}.json"
+    with open(directory / f"{name}.tmp.json", "w") as f:
+        json.dump(meta, f)
+    os.replace(directory / f"{name}.tmp.json", meta_path)
+    return meta_path
+
+
+# Grids shared by the ingest of this process
+grids = ForecastGrids()
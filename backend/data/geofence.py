@@ -0,0 +1,183 @@
+import collections
+import json
+import math
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from ports import PORTS, approach_box
+import metrics
+
+# Geofence events for the live vessel stream. Port, approach and anchorage zones are loaded once
+# at startup and bucketed into a coarse lat/lon grid; each position is looked up in its grid cell,
+# rejected by bounding box, and only the few remaining candidates get a point-in-polygon test, so
+# the cost per position stays flat however many zones and vessels there are.
+
+GEOFENCE_FILE = Path(os.getenv("GEOFENCE_FILE", Path(__file__).resolve().parent.parent / "geofences.json"))
+GEOFENCE_CELL_DEGREES = float(os.getenv("GEOFENCE_CELL_DEGREES", "0.25"))
+GEOFENCE_DWELL_SECONDS = float(os.getenv("GEOFENCE_DWELL_SECONDS", str(30 * 60)))  # inside this long -> "dwell"
+GEOFENCE_SILENCE_TTL = float(os.getenv("GEOFENCE_SILENCE_TTL", str(60 * 60)))  # silent this long -> "exit"
+
+GEOFENCE_EVENTS = metrics.Counter("geofence_events_total", "Geofence events emitted", ["event", "kind"])
+GEOFENCE_POLYGON_TESTS = metrics.Counter("geofence_polygon_tests_total", "Point-in-polygon tests run after grid and bounding box rejection")
+
+
+def point_in_polygon(latitude: float, longitude: float, polygon: list) -> bool:
+    """Ray casting test for a [[lat, lon], ...] polygon."""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lon_i = polygon[i]
+        lat_j, lon_j = polygon[j]
+        if (lat_i > latitude) != (lat_j > latitude):
+            crossing = lon_i + (latitude - lat_i) * (lon_j - lon_i) / (lat_j - lat_i)
+            if longitude < crossing:
+                inside = not inside
+        j = i
+    return inside
+
+
+class Zone:
+    def __init__(self, zone_id: str, port: str, kind: str, polygon: list):
+        self.id = zone_id
+        self.port = port
+        self.kind = kind
+        self.polygon = polygon
+        latitudes = [lat for lat, _ in polygon]
+        longitudes = [lon for _, lon in polygon]
+        self.bbox = (min(latitudes), min(longitudes), max(latitudes), max(longitudes))
+
+    def contains(self, latitude: float, longitude: float) -> bool:
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        if not (min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon):
+            return False
+        GEOFENCE_POLYGON_TESTS.inc()
+        return point_in_polygon(latitude, longitude, self.polygon)
+
+
+def load_zones(path: Path = GEOFENCE_FILE) -> list[Zone]:
+    """Zones from the geofence file, plus a square approach zone for every port it does not cover."""
+    zones = []
+    if path.exists():
+        with open(path, "r") as f:
+            for zone in json.load(f)["zones"]:
+                zones.append(Zone(zone["id"], zone["port"], zone["kind"], zone["polygon"]))
+    else:
+        print(f"Geofence file {path} not found, using port approach boxes only")
+
+    covered = {zone.port for zone in zones}
+    for port in PORTS:
+        if port not in covered:
+            (lat1, lon1), (lat2, lon2) = approach_box(port)
+            zones.append(Zone(f"{port}_APPROACH", port, "approach",
+                              [[lat1, lon1], [lat1, lon2], [lat2, lon2], [lat2, lon1]]))
+    return zones
+
+
+class GeofenceIndex:
+    """Grid of cell -> zones whose bounding box overlaps the cell."""
+
+    def __init__(self, zones: list[Zone], cell_degrees: float = GEOFENCE_CELL_DEGREES):
+        self.zones = zones
+        self.cell_degrees = cell_degrees
+        self._cells: dict[tuple[int, int], list[Zone]] = {}
+        for zone in zones:
+            min_lat, min_lon, max_lat, max_lon = zone.bbox
+            for row in range(self._cell(min_lat), self._cell(max_lat) + 1):
+                for column in range(self._cell(min_lon), self._cell(max_lon) + 1):
+                    self._cells.setdefault((row, column), []).append(zone)
+
+    def _cell(self, degrees: float) -> int:
+        return math.floor(degrees / self.cell_degrees)
+
+    def zones_at(self, latitude: float, longitude: float) -> list[Zone]:
+        candidates = self._cells.get((self._cell(latitude), self._cell(longitude)))
+        if not candidates:
+            return []
+        return [zone for zone in candidates if zone.contains(latitude, longitude)]
+
+
+class GeofenceEngine:
+    """
+    Tracks which zones every vessel is in and turns position updates into events:
+    "enter" and "exit" on crossing a zone boundary, "dwell" once a vessel has stayed inside
+    for GEOFENCE_DWELL_SECONDS. Vessels not heard from for GEOFENCE_SILENCE_TTL get an "exit"
+    at their last known position and are forgotten.
+    """
+
+    def __init__(self, index: GeofenceIndex = None, dwell_seconds: float = GEOFENCE_DWELL_SECONDS,
+                 silence_ttl: float = GEOFENCE_SILENCE_TTL):
+        self.index = index if index is not None else GeofenceIndex(load_zones())
+        self.dwell_seconds = dwell_seconds
+        self.silence_ttl = silence_ttl
+        self._inside: dict[int, dict[str, list]] = {}  # mmsi -> zone id -> [zone, entered_at, dwell reported]
+        # mmsi -> (seen_at, ship_data) of the vessels in _inside, least recently seen first
+        self._last_seen = collections.OrderedDict()
+
+    def update(self, ship_data: dict, now: float = None) -> list[dict]:
+        """Events caused by one position update, plus the exits of vessels that went silent."""
+        now = time.time() if now is None else now
+        events = self.expire(now)
+        mmsi = ship_data["mmsi"]
+        current = {zone.id: zone for zone in self.index.zones_at(ship_data["latitude"], ship_data["longitude"])}
+        inside = self._inside.get(mmsi)
+        if not current and not inside:
+            return events
+        if inside is None:
+            inside = self._inside[mmsi] = {}
+
+        for zone_id in list(inside):
+            if zone_id not in current:
+                zone, entered_at, _ = inside.pop(zone_id)
+                events.append(self._event("exit", zone, ship_data, now, now - entered_at))
+        for zone_id, zone in current.items():
+            state = inside.get(zone_id)
+            if state is None:
+                inside[zone_id] = [zone, now, False]
+                events.append(self._event("enter", zone, ship_data, now, 0.0))
+            elif not state[2] and now - state[1] >= self.dwell_seconds:
+                state[2] = True
+                events.append(self._event("dwell", zone, ship_data, now, now - state[1]))
+        if inside:
+            self._last_seen[mmsi] = (now, ship_data)
+            self._last_seen.move_to_end(mmsi)
+        else:
+            del self._inside[mmsi]
+            self._last_seen.pop(mmsi, None)
+        return events
+
+    def expire(self, now: float = None) -> list[dict]:
+        """Exit events for vessels inside a zone that have not been heard from for silence_ttl."""
+        now = time.time() if now is None else now
+        events = []
+        while self._last_seen:
+            mmsi, (seen_at, ship_data) = next(iter(self._last_seen.items()))
+            if now - seen_at < self.silence_ttl:
+                break
+            del self._last_seen[mmsi]
+            for zone, entered_at, _ in self._inside.pop(mmsi).values():
+                events.append(self._event("exit", zone, ship_data, now, seen_at - entered_at))
+        return events
+
+    def occupancy(self) -> dict[str, int]:
+        """Number of vessels currently inside each zone."""
+        counts = {}
+        for zones in self._inside.values():
+            for zone_id in zones:
+                counts[zone_id] = counts.get(zone_id, 0) + 1
+        return counts
+
+    @staticmethod
+    def _event(event: str, zone: Zone, ship_data: dict, now: float, duration: float) -> dict:
+        GEOFENCE_EVENTS.labels(event, zone.kind).inc()
+        return {"event": event,
+                "zone": zone.id,
+                "port": zone.port,
+                "kind": zone.kind,
+                "mmsi": ship_data["mmsi"],
+                "ship_name": ship_data.get("ship_name", ""),
+                "latitude": ship_data["latitude"],
+                "longitude": ship_data["longitude"],
+                "time": datetime.fromtimestamp(now, timezone.utc).isoformat(),
+                "seconds_inside": round(duration, 1)}
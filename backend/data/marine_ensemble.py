@@ -0,0 +1,126 @@
+import json
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+# Reduces the per-source Stormglass marine forecast (ecmwf, fcoo, metno, meto, sg, ...) to compact
+# per-hour ensemble statistics once, when the forecast is fetched, instead of on every request.
+# Implausible values (fcoo reports currentSpeed in the thousands) and sources far off the
+# cross-source median are masked before the statistics are taken. Directions use circular
+# statistics, so 350 and 10 degrees average to 0 rather than 180.
+
+LINEAR_VARIABLES = ["waveHeight", "currentSpeed", "seaLevel"]
+DIRECTION_VARIABLES = ["waveDirection", "currentDirection"]
+
+# Physically plausible ranges; anything outside is a source error
+PLAUSIBLE_RANGES = {
+    "waveHeight": (0.0, 30.0),  # meters
+    "currentSpeed": (0.0, 10.0),  # m/s
+    "seaLevel": (-20.0, 20.0),  # meters
+    "waveDirection": (0.0, 360.0),  # degrees
+    "currentDirection": (0.0, 360.0),
+}
+
+# With three or more sources, a value this many scaled MADs (but at least the tolerance) away
+# from the median of the hour is masked as an outlier
+OUTLIER_MAD_FACTOR = 5.0
+OUTLIER_TOLERANCE = {"waveHeight": 1.0, "currentSpeed": 0.5, "seaLevel": 0.5}
+
+STATS_FILE_NAME = "marine_stats.npz"
+
+
+def _source_matrix(hours: list, variable: str) -> np.ndarray:
+    """hours x sources matrix of one variable, NaN where a source has no value."""
+    sources = sorted({source for hour in hours for source in hour.get(variable, {})})
+    matrix = np.full((len(hours), len(sources)), np.nan)
+    for i, hour in enumerate(hours):
+        for j, source in enumerate(sources):
+            value = hour.get(variable, {}).get(source)
+            if value is not None:
+                matrix[i, j] = value
+    return matrix, sources
+
+
+def _mask_outliers(matrix: np.ndarray, variable: str) -> np.ndarray:
+    low, high = PLAUSIBLE_RANGES[variable]
+    matrix = np.where((matrix >= low) & (matrix <= high), matrix, np.nan)
+    tolerance = OUTLIER_TOLERANCE.get(variable)
+    if tolerance is None or matrix.shape[1] < 3:
+        return matrix
+    enough = (np.sum(~np.isnan(matrix), axis=1) >= 3)[:, None]
+    with np.errstate(all="ignore"):
+        median = np.nanmedian(matrix, axis=1, keepdims=True)
+        mad = 1.4826 * np.nanmedian(np.abs(matrix - median), axis=1, keepdims=True)
+    outlier = enough & (np.abs(matrix - median) > np.maximum(OUTLIER_MAD_FACTOR * mad, tolerance))
+    return np.where(outlier, np.nan, matrix)
+
+
+def reduce_marine(hours: list) -> dict[str, np.ndarray]:
+    """
+    Per-hour ensemble statistics of the Stormglass "hours" list, as flat arrays keyed
+    "time" and "<variable>.<stat>" with stats mean, spread, min, max (linear variables only)
+    and sources (number of sources left after masking).
+    """
+    stats = {"time": np.array([hour["time"][:19] for hour in hours], dtype="datetime64[s]")}
+    with np.errstate(all="ignore"):
+        for variable in LINEAR_VARIABLES + DIRECTION_VARIABLES:
+            matrix, sources = _source_matrix(hours, variable)
+            matrix = _mask_outliers(matrix, variable)
+            stats[f"{variable}.sources"] = np.sum(~np.isnan(matrix), axis=1).astype(np.int8)
+            if variable in DIRECTION_VARIABLES:
+                radians = np.radians(matrix)
+                sin, cos = np.nanmean(np.sin(radians), axis=1), np.nanmean(np.cos(radians), axis=1)
+                mean = np.degrees(np.arctan2(sin, cos)) % 360
+                resultant = np.clip(np.hypot(sin, cos), 1e-12, 1.0)
+                stats[f"{variable}.spread"] = np.degrees(np.sqrt(-2 * np.log(resultant)))
+            else:
+                mean = np.nanmean(matrix, axis=1)
+                stats[f"{variable}.spread"] = np.nanstd(matrix, axis=1)
+                stats[f"{variable}.min"] = np.nanmin(matrix, axis=1) if sources else mean
+                stats[f"{variable}.max"] = np.nanmax(matrix, axis=1) if sources else mean
+            stats[f"{variable}.mean"] = mean
+    return stats
+
+
+def stats_path(marine_path: Path) -> Path:
+    return Path(marine_path).with_name(STATS_FILE_NAME)
+
+
+def write_marine_stats(marine_path) -> dict[str, np.ndarray]:
+    """
+    Reduce a marine_data.json file and store the result next to it, tagged with the file's mtime.
+    The file is written under a temporary name and renamed into place, so concurrent writers and
+    readers never see a partial archive.
+    """
+    marine_path = Path(marine_path)
+    with open(marine_path) as f:
+        stats = reduce_marine(json.load(f)["hours"])
+    path = stats_path(marine_path)
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.stem, suffix=".tmp.npz")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, source_mtime_ns=np.int64(marine_path.stat().st_mtime_ns), **stats)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not store marine statistics: {e}")
+        if tmp_path is not None:
+            Path(tmp_path).unlink(missing_ok=True)
+    return stats
+
+
+def load_marine_stats(marine_path) -> dict[str, np.ndarray]:
+    """Statistics of a marine_data.json file, from the stored reduction when it is up to date."""
+    marine_path = Path(marine_path)
+    path = stats_path(marine_path)
+    if path.exists():
+        try:
+            with np.load(path) as stored:
+                if int(stored["source_mtime_ns"]) == marine_path.stat().st_mtime_ns:
+                    return {key: stored[key] for key in stored.files if key != "source_mtime_ns"}
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            print(f"Discarding unreadable marine statistics {path}: {e}")
+    return write_marine_stats(marine_path)
@@ -1,5 +1,4 @@
 import os
-import requests
 import json
 
 def query_news_api(query: str, start_date: str, end_date: str):
@@ -7,6 +6,7 @@ def query_news_api(query: str, start_date: str, end_date: str):
     Function to query news articles from NewsAPI based on a search query.
     Returns a list of articles with title, description, url, and publishedAt.
     """
+    import requests  # loaded on first use, see warmup.py
 
     stress_keywords = "strike OR closure OR delay OR accident OR gridlock OR congestion"
     query = f'"{query}" AND ({stress_keywords})'
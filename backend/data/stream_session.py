@@ -0,0 +1,126 @@
+import os
+
+from pydantic import ValidationError
+
+import admission
+from data.dead_reckoning import DeadReckoningFilter
+from destinations import canonical_destination
+from models import StreamSubscription
+import metrics
+
+# Multiplexed vessel streams: one WebSocket carries any number of subscriptions (ports and
+# filters), added and removed with control messages while the connection stays open:
+#   {"action": "subscribe", "id": "rtm", "port": "ROTTERDAM", "min_length": 200, "ship_types": [70, 80]}
+#   {"action": "unsubscribe", "id": "rtm"}
+# Every ship update is sent once, tagged with the ids of the subscriptions it matches:
+#   {"type": "ship", "subscriptions": ["rtm"], "ship": {...}}
+
+MAX_STREAM_SUBSCRIPTIONS = int(os.getenv("MAX_STREAM_SUBSCRIPTIONS", "20"))  # per WebSocket
+
+STREAM_SUBSCRIPTIONS = metrics.Gauge("stream_subscriptions", "Open subscriptions on multiplexed /ws/stream sockets")
+
+
+class StreamFilter:
+    """One subscription of a multiplexed stream, with its own dead-band state."""
+
+    def __init__(self, spec: StreamSubscription):
+        self.id = spec.id
+        self.port = canonical_destination(spec.port) if spec.port else None
+        self.min_length = spec.min_length
+        self.ship_types = set(spec.ship_types) if spec.ship_types else None
+        self.dead_reckoning = DeadReckoningFilter() if spec.dead_band else None
+
+    def matches(self, update: dict) -> bool:
+        ship = update["ship"]
+        if self.port is not None and not (update["port_bound"] and ship["destination"] == self.port):
+            return False
+        if self.min_length and (ship.get("length") or 0) < self.min_length:
+            return False
+        if self.ship_types is not None:
+            # A multiple of 10 selects the whole AIS category, e.g. 70 for every cargo ship type 70-79
+            ship_type = ship.get("ship_type") or 0
+            if ship_type not in self.ship_types and ship_type // 10 * 10 not in self.ship_types:
+                return False
+        return True
+
+    def should_send(self, update: dict) -> bool:
+        if not self.matches(update):
+            return False
+        return self.dead_reckoning is None or self.dead_reckoning.should_send(update["ship"])
+
+    def describe(self) -> dict:
+        return {"id": self.id, "port": self.port, "min_length": self.min_length,
+                "ship_types": sorted(self.ship_types) if self.ship_types else None}
+
+
+class StreamSession:
+    """State of one multiplexed WebSocket: its subscriptions and their demand on the shared hub."""
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.filters: dict[str, StreamFilter] = {}
+
+    def handle(self, message) -> list[dict]:
+        """Apply a control message, returning the messages to send back (acknowledgement, snapshot)."""
+        action = message.get("action") if isinstance(message, dict) else None
+        if action == "subscribe":
+            try:
+                spec = StreamSubscription(**{key: value for key, value in message.items() if key != "action"})
+            except ValidationError as e:
+                return [{"type": "error", "id": message.get("id"), "detail": e.errors(include_url=False)}]
+            if spec.id not in self.filters and len(self.filters) >= MAX_STREAM_SUBSCRIPTIONS:
+                return [{"type": "error", "id": spec.id,
+                         "detail": f"At most {MAX_STREAM_SUBSCRIPTIONS} subscriptions per connection"}]
+            stream_filter = StreamFilter(spec)
+            # Subscribing with an existing id replaces that subscription. The new port is admitted
+            # first, so a refused replacement leaves the old subscription in place; one on the
+            # same port keeps its slot.
+            replaced = self.filters.get(spec.id)
+            same_port = replaced is not None and replaced.port == stream_filter.port
+            if stream_filter.port is not None and not same_port:
+                try:
+                    admission.streams.watch("/ws/stream", stream_filter.port)
+                except admission.Shed as e:
+                    return [{"type": "error", "id": spec.id, "detail": str(e), "retry_after": e.retry_after}]
+            self._remove(spec.id, unwatch=not same_port)
+            self.filters[spec.id] = stream_filter
+            self.hub.update_demand(stream_filter.port, 1)
+            STREAM_SUBSCRIPTIONS.inc()
+            replies = [{"type": "subscribed", **stream_filter.describe()}]
+            # Catch the new subscription up on vessels heard from recently
+            replies += [{"type": "ship", "subscriptions": [spec.id], "ship": update["ship"]}
+                        for update in self.hub.snapshot() if stream_filter.should_send(update)]
+            return replies
+        if action == "unsubscribe":
+            if not self._remove(message.get("id")):
+                return [{"type": "error", "id": message.get("id"), "detail": "Unknown subscription"}]
+            return [{"type": "unsubscribed", "id": message["id"]}]
+        return [{"type": "error", "detail": "action must be 'subscribe' or 'unsubscribe'"}]
+
+    def route(self, update: dict):
+        """The tagged message for an update, or None if no subscription wants it."""
+        subscriptions = [sub_id for sub_id, stream_filter in self.filters.items() if stream_filter.should_send(update)]
+        if not subscriptions:
+            return None
+        return {"type": "ship", "subscriptions": subscriptions, "ship": update["ship"]}
+
+    async def updates(self):
+        """Async generator of tagged ship messages from the shared hub."""
+        async for update in self.hub.subscribe(multiplexed=True):
+            message = self.route(update)
+            if message is not None:
+                yield message
+
+    def close(self):
+        for sub_id in list(self.filters):
+            self._remove(sub_id)
+
+    def _remove(self, sub_id, unwatch: bool = True) -> bool:
+        stream_filter = self.filters.pop(sub_id, None)
+        if stream_filter is None:
+            return False
+        self.hub.update_demand(stream_filter.port, -1)
+        if stream_filter.port is not None and unwatch:
+            admission.streams.unwatch(stream_filter.port)
+        STREAM_SUBSCRIPTIONS.dec()
+        return True
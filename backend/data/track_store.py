@@ -0,0 +1,206 @@
+import math
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Append-only store of vessel positions, partitioned into one SQLite (WAL) file per UTC day so
+# old history is dropped by deleting files. Writes are batched on a background thread so the
+# event loop never waits on disk; readers open their own connections and never block the writer.
+
+TRACK_STORE_DIR = Path(os.getenv("TRACK_STORE_DIR", Path(__file__).resolve().parent.parent / "tracks"))
+TRACK_RETENTION_DAYS = int(os.getenv("TRACK_RETENTION_DAYS", "7"))
+
+# Positions per transaction, and how long a partial batch may wait before it is written
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    mmsi INTEGER NOT NULL,
+    t REAL NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    speed REAL,
+    course REAL,
+    heading REAL
+);
+CREATE INDEX IF NOT EXISTS positions_mmsi_t ON positions (mmsi, t);
+"""
+
+
+def partition_name(day: datetime) -> str:
+    return f"tracks-{day.strftime('%Y%m%d')}.sqlite"
+
+
+def position_time(timestamp: str) -> float | None:
+    """
+    Epoch seconds of an AIS MetaData time_utc ("2026-10-19 04:00:00.123456789 +0000 UTC") or of
+    an ISO UTC timestamp, None if it cannot be parsed.
+    """
+    text = str(timestamp).replace("T", " ")
+    try:
+        base = datetime.strptime(text[:19], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    # time_utc carries nanoseconds, more than strptime's %f accepts
+    fraction = re.match(r"\.(\d+)", text[19:])
+    return base.timestamp() + (float("0." + fraction.group(1)) if fraction else 0.0)
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+class TrackStore:
+    """Batched, day-partitioned writer and range reader for vessel position history."""
+
+    def __init__(self, directory: Path = TRACK_STORE_DIR, retention_days: int = TRACK_RETENTION_DAYS):
+        self.directory = Path(directory)
+        self.retention_days = retention_days
+        self._pending = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def append(self, ship_data: dict, received_at: float = None):
+        """
+        Queue a ShipPositionData dict for writing. Never blocks. Positions are stamped with their
+        AIS time_utc, so replayed recordings land at the time they were received upstream, and
+        with the current time only when that is missing. Positions older than the retention
+        window are dropped.
+        """
+        if received_at is None:
+            received_at = position_time(ship_data.get("timestamp")) or time.time()
+        if received_at < time.time() - self.retention_days * 86400:
+            return
+        if self._thread is None:
+            self._start()
+        self._pending.put((
+            ship_data["mmsi"],
+            received_at,
+            ship_data["latitude"],
+            ship_data["longitude"],
+            ship_data.get("speed"),
+            ship_data.get("course"),
+            ship_data.get("heading"),
+        ))
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._thread = threading.Thread(target=self._write_loop, name="track-store-writer", daemon=True)
+                self._thread.start()
+
+    def _write_loop(self):
+        connections = {}
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(batch) < BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Group by day so every position lands in its own partition
+            by_partition = {}
+            for row in batch:
+                day = datetime.fromtimestamp(row[1], tz=timezone.utc)
+                by_partition.setdefault(partition_name(day), []).append(row)
+
+            for name, rows in by_partition.items():
+                if name not in connections:
+                    connections[name] = _connect(self.directory / name)
+                    self._expire_partitions(connections)
+                try:
+                    with connections[name]:
+                        connections[name].executemany("INSERT INTO positions VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                except sqlite3.Error as e:
+                    print(f"Track store write failed: {e}")
+
+    def _expire_partitions(self, connections: dict):
+        """Delete partitions older than the retention window."""
+        cutoff = partition_name(datetime.now(timezone.utc) - timedelta(days=self.retention_days))
+        for path in self.directory.glob("tracks-*.sqlite"):
+            if path.name < cutoff:
+                connection = connections.pop(path.name, None)
+                if connection is not None:
+                    connection.close()
+                for suffix in ("", "-wal", "-shm"):
+                    Path(str(path) + suffix).unlink(missing_ok=True)
+
+    def get_track(self, mmsi: int, start: datetime, end: datetime) -> list[tuple]:
+        """Return (t, latitude, longitude, speed, course) rows for a vessel between start and end, oldest first."""
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        rows = []
+        day = start.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        while day <= end:
+            path = self.directory / partition_name(day)
+            if path.exists():
+                connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+                try:
+                    rows.extend(connection.execute(
+                        "SELECT t, latitude, longitude, speed, course FROM positions "
+                        "WHERE mmsi = ? AND t >= ? AND t <= ? ORDER BY t",
+                        (mmsi, start_ts, end_ts),
+                    ))
+                finally:
+                    connection.close()
+            day += timedelta(days=1)
+        return rows
+
+
+def simplify_track(rows: list[tuple], tolerance_m: float) -> list[tuple]:
+    """
+    Douglas-Peucker simplification of (t, latitude, longitude, ...) rows, keeping every point that
+    deviates more than tolerance_m meters from the simplified line.
+    """
+    if tolerance_m <= 0 or len(rows) < 3:
+        return rows
+
+    # Project onto a local equirectangular plane in meters, good enough at track scale
+    meters_per_degree = 111320.0
+    lon_scale = math.cos(math.radians(sum(row[1] for row in rows) / len(rows)))
+    xy = [(row[2] * meters_per_degree * lon_scale, row[1] * meters_per_degree) for row in rows]
+
+    keep = [False] * len(rows)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(rows) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = xy[first], xy[last]
+        dx, dy = x2 - x1, y2 - y1
+        length = math.hypot(dx, dy)
+
+        max_distance, index = 0.0, None
+        for i in range(first + 1, last):
+            x, y = xy[i]
+            if length == 0:
+                distance = math.hypot(x - x1, y - y1)
+            else:
+                distance = abs(dy * x - dx * y + x2 * y1 - y2 * x1) / length
+            if distance > max_distance:
+                max_distance, index = distance, i
+
+        if index is not None and max_distance > tolerance_m:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [row for row, kept in zip(rows, keep) if kept]
+
+
+# Shared store used by the ingest and the tracks router
+store = TrackStore()
@@ -3,11 +3,35 @@ import websockets
 import json
 from datetime import datetime, timezone
 import os
-from ship_analysis import assess_ship_docking
+import random
+import time
+from ship_analysis import assess_ship_docking, eta_to_iso
 from dotenv import load_dotenv
 from models import ShipPositionData
+from destinations import canonical_destination
+from data.ais_subscription import SubscriptionManager, GLOBAL_BOUNDING_BOX
+from data.forecast_grid import grids as forecast_grids
+import metrics
 load_dotenv()
 
+# Upstream AIS stream, overridable to point at a local replay server (see replay_ais.py)
+AIS_STREAM_URL = os.getenv("AIS_STREAM_URL", "wss://stream.aisstream.io/v0/stream")
+
+AIS_MESSAGES_RECEIVED = metrics.Counter("ais_messages_received_total", "AIS messages received from the upstream stream", ["message_type"])
+AIS_MESSAGES_DECODED = metrics.Counter("ais_messages_decoded_total", "AIS messages decoded into vessel state or updates", ["message_type"])
+AIS_MESSAGES_DROPPED = metrics.Counter("ais_messages_dropped_total", "AIS messages discarded by the ingest filters", ["message_type", "reason"])
+TRACKED_VESSELS = metrics.Gauge("ais_tracked_vessels", "Vessels currently held in the ingest state")
+UPSTREAM_CONNECTED = metrics.Gauge("ais_upstream_connected", "Whether the upstream AIS stream is connected")
+UPSTREAM_RECONNECTS = metrics.Counter("ais_upstream_reconnects_total", "Upstream AIS stream reconnects by cause", ["reason"])
+
+# Reconnect with full-jitter exponential backoff so restarting workers don't stampede aisstream.io
+RECONNECT_BASE_DELAY = 1.0
+RECONNECT_MAX_DELAY = 60.0
+# A connection this old is considered healthy, and the backoff starts over after it drops
+RECONNECT_RESET_AFTER = 60.0
+# Reconnect if no message arrived for this long; narrow subscriptions may legitimately be quiet for a while
+STALL_TIMEOUT = float(os.getenv("AIS_STALL_TIMEOUT", "120"))
+
 
 async def predict_port_bound_ships(bounding_box: list[list[float]], port: str, filter_ship_mmsi: list[str] = None,
                              filter_message_types: list[str] = ["ShipStaticData", "PositionReport"]):
@@ -19,7 +43,7 @@ async def predict_port_bound_ships(bounding_box: list[list[float]], port: str, f
     ships_to_track = set()
     ship_static_info = {}  # Store static info for each ship
     
-    async with websockets.connect("wss://stream.aisstream.io/v0/stream") as websocket:
+    async with websockets.connect(AIS_STREAM_URL) as websocket:
         subscribe_message = {"APIKey": os.getenv("AIS_API_KEY"),  # Required !
                              "BoundingBoxes": [bounding_box], # Required!
                              "FiltersShipMMSI": filter_ship_mmsi, # Optional!
@@ -37,8 +61,8 @@ async def predict_port_bound_ships(bounding_box: list[list[float]], port: str, f
                 length = static_data["Dimension"]["A"] + static_data["Dimension"]["B"] + static_data["Dimension"]["C"] + static_data["Dimension"]["D"]
                 if length <= 60:
                     continue
-                destination = static_data.get("Destination", "").strip()
-                if destination != port:
+                destination = canonical_destination(static_data.get("Destination", ""))
+                if destination != canonical_destination(port):
                     continue
                 if static_data["Eta"]["Month"] != 0:
                     continue
@@ -101,6 +125,176 @@ async def predict_port_bound_ships(bounding_box: list[list[float]], port: str, f
                 # Yield the data for API consumption
                 yield ship_data.model_dump()
 
+def default_subscription() -> SubscriptionManager:
+    """Global subscription to ShipStaticData and PositionReport, never narrowed."""
+    return SubscriptionManager(os.getenv("AIS_API_KEY"), ["ShipStaticData", "PositionReport"])
+
+
+async def stream_vessel_updates(subscription: SubscriptionManager = None, ship_static_info: dict = None,
+                                reconnect: bool = True):
+    """
+    Async generator that decodes the AIS stream once on behalf of every consumer.
+    Yields dicts of the form {"port_bound": bool, "ship": ShipPositionData dict} for every ship
+    longer than 60m. Ships eligible for port tracking carry their docking risk assessment, so
+    consumers only need to filter on the destination.
+
+    The subscription manager decides which part of the global stream is requested and may
+    narrow it to the port-bound ships consumers actually watch. Dropped or stalled connections
+    are re-established with jittered backoff and re-subscribed; ship_static_info, if passed in,
+    outlives this generator so a restarted ingest does not have to rediscover every ship.
+    """
+    subscription = subscription or default_subscription()
+    ship_static_info = {} if ship_static_info is None else ship_static_info
+    attempt = 0
+
+    while True:
+        connected_at = time.monotonic()
+        try:
+            async with websockets.connect(AIS_STREAM_URL) as websocket:
+                UPSTREAM_CONNECTED.set(1)
+                await websocket.send(json.dumps(subscription.initial()))
+                maintain_task = asyncio.create_task(subscription.maintain(websocket))
+                try:
+                    async for update in _decode_vessel_updates(websocket, subscription, ship_static_info):
+                        yield update
+                finally:
+                    maintain_task.cancel()
+            reason = "closed"
+        except TimeoutError:
+            reason = "stalled"
+        except AisStreamError as e:
+            if not reconnect:
+                raise
+            print(f"AIS stream rejected the connection: {e}")
+            reason = "upstream_error"
+        except (OSError, websockets.WebSocketException) as e:
+            if not reconnect:
+                raise
+            print(f"AIS stream error: {e}")
+            reason = "error"
+        finally:
+            UPSTREAM_CONNECTED.set(0)
+
+        if not reconnect:
+            return
+        if time.monotonic() - connected_at > RECONNECT_RESET_AFTER:
+            attempt = 0
+        delay = random.uniform(0, min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * 2 ** attempt))
+        attempt += 1
+        UPSTREAM_RECONNECTS.labels(reason).inc()
+        print(f"AIS stream {reason}, reconnecting in {delay:.1f}s (attempt {attempt})")
+        await asyncio.sleep(delay)
+
+
+class AisStreamError(Exception):
+    """aisstream.io reported an error (bad API key, malformed subscription, ...) instead of data."""
+
+
+async def _decode_vessel_updates(websocket, subscription: SubscriptionManager, ship_static_info: dict):
+    """Decode raw AIS messages from an open stream into vessel updates until it closes or stalls."""
+    while True:
+        try:
+            message_json = await asyncio.wait_for(websocket.recv(), STALL_TIMEOUT)
+        except websockets.ConnectionClosedOK:
+            return
+        message_type = "unknown"
+        try:
+            message = json.loads(message_json)
+            if "error" in message:
+                raise AisStreamError(message["error"])
+            message_type = message["MessageType"]
+            AIS_MESSAGES_RECEIVED.labels(message_type).inc()
+            update = _decode_message(message, message_type, subscription, ship_static_info)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            # One bad frame (missing Dimension or Eta, invalid position, ...) must not end the stream;
+            # pydantic's ValidationError is a ValueError
+            AIS_MESSAGES_DROPPED.labels(message_type, "malformed").inc()
+            print(f"Skipping malformed AIS {message_type} message: {type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}")
+            continue
+        if update is not None:
+            yield update
+
+
+def _decode_message(message: dict, message_type: str, subscription: SubscriptionManager, ship_static_info: dict):
+    """Vessel update for one AIS message, or None if it only updates state or is filtered out."""
+    if message_type == "ShipStaticData":
+        static_data = message["Message"]["ShipStaticData"]
+        length = static_data["Dimension"]["A"] + static_data["Dimension"]["B"] + static_data["Dimension"]["C"] + static_data["Dimension"]["D"]
+        if length <= 60:
+            AIS_MESSAGES_DROPPED.labels(message_type, "too_small").inc()
+            return None
+        user_id = static_data["UserID"]
+        # Free-text destinations ("NL RTM", "ROTTERDAM ANCH", ...) resolve to the port name clients use
+        destination = canonical_destination(static_data.get("Destination", ""))
+
+        ship_info = {
+            "name": static_data.get("Name", "Unknown"),
+            "call_sign": static_data.get("CallSign", ""),
+            "destination": destination,
+            "ship_type": static_data.get("Type", 0),
+            "length": length,
+            "port_bound": False,
+            "updated_at": time.monotonic(),  # for pruning silent ships, see vessel_hub.prune_vessel_state
+        }
+
+        # Same eligibility rule as predict_port_bound_ships, minus the port match
+        if destination and static_data["Eta"]["Month"] == 0:
+            status, risk_score, risk_factors = assess_ship_docking(static_data["Eta"])
+            ship_info.update({
+                "eta": static_data.get("Eta", None),
+                "eta_time": eta_to_iso(static_data["Eta"], datetime.now(timezone.utc).isoformat()),
+                "status": status,
+                "risk_score": risk_score,
+                "risk_factors": risk_factors,
+                "port_bound": True
+            })
+
+        ship_static_info[user_id] = ship_info
+        subscription.track(user_id, ship_info["port_bound"], destination)
+        TRACKED_VESSELS.set(len(ship_static_info))
+        AIS_MESSAGES_DECODED.labels(message_type).inc()
+
+    elif message_type == "PositionReport":
+        position_data = message["Message"]["PositionReport"]
+        user_id = position_data["UserID"]
+
+        ship_info = ship_static_info.get(user_id)
+        if ship_info is None:
+            AIS_MESSAGES_DROPPED.labels(message_type, "untracked").inc()
+            return None
+
+        ship_data = ShipPositionData(
+            mmsi=user_id,
+            ship_name=ship_info.get("name") or message.get("MetaData", {}).get("ShipName", "Unknown"),
+            latitude=position_data.get("Latitude"),
+            longitude=position_data.get("Longitude"),
+            speed=position_data.get("Sog", 0),  # Speed over ground
+            course=position_data.get("Cog", 0),  # Course over ground
+            heading=position_data.get("TrueHeading", 0),
+            nav_status=position_data.get("NavigationalStatus", 15),
+            timestamp=message.get("MetaData", {}).get("time_utc", datetime.now(timezone.utc).isoformat()),
+            destination=ship_info.get("destination", ""),
+            call_sign=ship_info.get("call_sign", ""),
+            ship_type=ship_info.get("ship_type", 0),
+            eta=ship_info.get("eta", None),
+            eta_time=ship_info.get("eta_time", None),
+            status=ship_info.get("status", None),
+            risk_score=ship_info.get("risk_score", None),
+            risk_factors=ship_info.get("risk_factors", None),
+            length=ship_info["length"]
+        )
+
+        ship = ship_data.model_dump()
+        # Sampled from the local forecast grids, no network on this path
+        ship["enroute_risk"] = forecast_grids.enroute_risk(ship)
+
+        AIS_MESSAGES_DECODED.labels(message_type).inc()
+        return {"port_bound": ship_info["port_bound"], "ship": ship}
+
+    else:
+        AIS_MESSAGES_DROPPED.labels(message_type, "unhandled_type").inc()
+    return None
+
 async def get_filtered_ships(bounding_box: list[list[float]]):
     """
     Async generator that yields all ships in the bounding box that meet minimum size requirements (length > 60m).
@@ -109,7 +303,7 @@ async def get_filtered_ships(bounding_box: list[list[float]]):
     ships_to_track = set()
     ship_static_info = {}  # Store static info for each ship
     
-    async with websockets.connect("wss://stream.aisstream.io/v0/stream") as websocket:
+    async with websockets.connect(AIS_STREAM_URL) as websocket:
         subscribe_message = {"APIKey": os.getenv("AIS_API_KEY"),  # Required !
                              "BoundingBoxes": [bounding_box], # Required!
                              "FiltersShipMMSI": None, # Optional!
@@ -133,7 +327,7 @@ async def get_filtered_ships(bounding_box: list[list[float]]):
                 ship_static_info[user_id] = {
                     "name": static_data.get("Name", "Unknown"),
                     "call_sign": static_data.get("CallSign", ""),
-                    "destination": static_data.get("Destination", "").strip(),
+                    "destination": canonical_destination(static_data.get("Destination", "")),
                     "ship_type": static_data.get("Type", 0)
                 }
                 
@@ -173,7 +367,7 @@ async def get_all_ships(bounding_box: list[list[float]]):
     """
     Async generator that yields all ships in the bounding box.
     """
-    async with websockets.connect("wss://stream.aisstream.io/v0/stream") as websocket:
+    async with websockets.connect(AIS_STREAM_URL) as websocket:
         subscribe_message = {"APIKey": os.getenv("AIS_API_KEY"),  # Required !
                              "BoundingBoxes": [bounding_box], # Required!
                              "FiltersShipMMSI": None, # Optional!
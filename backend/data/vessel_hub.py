@@ -0,0 +1,276 @@
+import asyncio
+import collections
+import json
+import os
+import time
+
+import data.vessel as vessel
+from data.track_store import TrackStore, store as track_store
+from data.dead_reckoning import DeadReckoningFilter
+from data.ais_subscription import SubscriptionManager
+from data.geofence import GeofenceEngine
+from data.congestion import CongestionForecast
+from destinations import canonical_destination
+import metrics
+
+# Path of the Unix socket the ingestion process (ingest.py) publishes vessel updates on.
+# When unset, every web worker runs its own in-process ingest instead.
+FEED_SOCKET_PATH = os.getenv("VESSEL_FEED_SOCKET")
+
+# Maximum number of updates buffered per consumer before the oldest are dropped
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+# New subscribers first get the latest update of every vessel heard from within this many seconds,
+# so a reconnecting client sees its map again immediately instead of waiting for fresh reports
+SNAPSHOT_MAX_AGE = 15 * 60
+
+# Static vessel info of ships silent for SNAPSHOT_MAX_AGE is swept at most this often
+STATE_SWEEP_INTERVAL = 60.0  # seconds
+
+UPDATES_DROPPED = metrics.Counter("vessel_hub_updates_dropped_total", "Updates dropped because a client fell behind")
+FEED_LINES_DROPPED = metrics.Counter("vessel_hub_feed_lines_dropped_total", "Unreadable lines from the ingest feed socket")
+
+
+def offer(queue: asyncio.Queue, item) -> bool:
+    """
+    Put item on a bounded queue, dropping the oldest entry if a slow consumer has filled it.
+    Returns True if an entry was dropped.
+    """
+    dropped = False
+    if queue.full():
+        try:
+            queue.get_nowait()
+            dropped = True
+        except asyncio.QueueEmpty:
+            pass
+    queue.put_nowait(item)
+    return dropped
+
+
+def prune_vessel_state(latest: collections.OrderedDict, ship_static_info: dict, now: float, sweep_static: bool):
+    """
+    Forget vessels silent for SNAPSHOT_MAX_AGE: drop them from latest, an mmsi -> (received_at, ...)
+    map kept in least recently heard order, and, with sweep_static, drop the static info of ships
+    neither in latest nor updated within SNAPSHOT_MAX_AGE. Returns the MMSIs forgotten.
+    """
+    cutoff = now - SNAPSHOT_MAX_AGE
+    while latest and next(iter(latest.values()))[0] < cutoff:
+        latest.popitem(last=False)
+    forgotten = []
+    if sweep_static:
+        for mmsi, info in list(ship_static_info.items()):
+            if mmsi not in latest and info.get("updated_at", now) < cutoff:
+                del ship_static_info[mmsi]
+                forgotten.append(mmsi)
+    return forgotten
+
+
+class VesselHub:
+    """
+    Fans decoded vessel updates out to every WebSocket client of this process.
+
+    There is exactly one upstream per process: either the AIS stream itself (single process mode)
+    or the Unix socket of the ingestion process (multi-worker mode, see ingest.py).
+    """
+
+    def __init__(self, socket_path: str = None, track_store: TrackStore | None = track_store):
+        self.socket_path = socket_path
+        # Where positions from the AIS stream are recorded, None to not keep history
+        self.track_store = track_store
+        self._subscribers: set[asyncio.Queue] = set()
+        self._task: asyncio.Task = None
+        # Subscriber count per watched port, None standing for clients that want every ship.
+        # Lets the in-process ingest narrow its upstream subscription to what is actually watched.
+        self._demand = collections.Counter()
+        self.subscription = SubscriptionManager(os.getenv("AIS_API_KEY"), ["ShipStaticData", "PositionReport"],
+                                                wide_demand=False)
+        # Vessel state outlives the upstream task, so an idle restart or reconnect resumes where it left off
+        self.ship_static_info = {}
+        self._latest = collections.OrderedDict()  # mmsi -> (received_at, update), least recently heard first
+        self._swept_at = time.monotonic()
+        self.reconnect = True
+        # Zone enter/exit/dwell events derived from every position update, on their own stream
+        self.geofences = GeofenceEngine()
+        # Hourly arrival counts per port from the ETAs and docking status of port-bound ships
+        self.congestion = CongestionForecast()
+        self._event_subscribers: set[asyncio.Queue] = set()
+
+    def publish(self, update):
+        """Deliver an update (or a terminating exception) to every subscriber."""
+        if isinstance(update, dict):
+            now = time.monotonic()
+            mmsi = update["ship"]["mmsi"]
+            self._latest[mmsi] = (now, update)
+            self._latest.move_to_end(mmsi)
+            sweep = now - self._swept_at >= STATE_SWEEP_INTERVAL
+            if sweep:
+                self._swept_at = now
+            for forgotten in prune_vessel_state(self._latest, self.ship_static_info, now, sweep):
+                self.subscription.forget(forgotten)
+            self.congestion.update(update["ship"], update["port_bound"])
+            for event in self.geofences.update(update["ship"]):
+                for queue in self._event_subscribers:
+                    if offer(queue, event):
+                        UPDATES_DROPPED.inc()
+        else:
+            for queue in self._event_subscribers:
+                offer(queue, update)
+        for queue in self._subscribers:
+            if offer(queue, update):
+                UPDATES_DROPPED.inc()
+
+    def snapshot(self) -> list:
+        """Latest update of every recently heard vessel."""
+        prune_vessel_state(self._latest, self.ship_static_info, time.monotonic(), sweep_static=False)
+        return [update for _, update in self._latest.values()]
+
+    def queue_depths(self) -> list[int]:
+        """Number of updates waiting to be sent, per subscribed client."""
+        return [queue.qsize() for queue in self._subscribers]
+
+    def update_demand(self, port: str, delta: int):
+        """Add or remove interest in ships heading to port (None: every ship) for the upstream subscription."""
+        self._demand[port] += delta
+        if self._demand[port] <= 0:
+            del self._demand[port]
+        self.subscription.wide_demand = None in self._demand
+        self.subscription.watched_ports = {port for port in self._demand if port is not None}
+
+    async def subscribe(self, port: str = None, multiplexed: bool = False):
+        """
+        Async generator yielding every vessel update received after subscribing.
+        port declares that only ships heading there are needed; None means every ship.
+        multiplexed subscribers (see data/stream_session.py) declare demand and replay the
+        snapshot per stream subscription themselves, so neither happens here.
+        """
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        if not multiplexed:
+            self.update_demand(port, 1)
+        self._ensure_started()
+        try:
+            if not multiplexed:
+                for update in self.snapshot():
+                    yield update
+            while True:
+                update = await queue.get()
+                if isinstance(update, Exception):
+                    raise update
+                yield update
+        finally:
+            self._subscribers.discard(queue)
+            if not multiplexed:
+                self.update_demand(port, -1)
+            self._release_if_idle()
+
+    async def geofence_events(self, port: str = None):
+        """
+        Async generator yielding geofence events (see data/geofence.py), optionally only for one port's zones.
+        Zones are crossed by ships heading anywhere, so this needs the upstream to carry every ship.
+        """
+        port = canonical_destination(port) if port else None
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._event_subscribers.add(queue)
+        self.update_demand(None, 1)
+        self._ensure_started()
+        try:
+            while True:
+                event = await queue.get()
+                if isinstance(event, Exception):
+                    raise event
+                if port is None or event["port"] == port:
+                    yield event
+        finally:
+            self._event_subscribers.discard(queue)
+            self.update_demand(None, -1)
+            self._release_if_idle()
+
+    def _release_if_idle(self):
+        if not self._subscribers and not self._event_subscribers and self._task is not None and self.socket_path is None:
+            # Nobody is listening anymore, release the upstream AIS connection
+            self._task.cancel()
+            self._task = None
+
+    async def ships_for_port(self, port: str, dead_band: bool = False):
+        """
+        Async generator yielding ship data for ships heading to the given port.
+        With dead_band, updates the client can dead-reckon itself are skipped.
+        """
+        port = canonical_destination(port)
+        dead_reckoning = DeadReckoningFilter() if dead_band else None
+        async for update in self.subscribe(port):
+            if update["port_bound"] and update["ship"]["destination"] == port:
+                if dead_reckoning is None or dead_reckoning.should_send(update["ship"]):
+                    yield update["ship"]
+
+    async def filtered_ships(self, dead_band: bool = False):
+        """
+        Async generator yielding ship data for all ships longer than 60m.
+        With dead_band, updates the client can dead-reckon itself are skipped.
+        """
+        dead_reckoning = DeadReckoningFilter() if dead_band else None
+        async for update in self.subscribe():
+            if dead_reckoning is None or dead_reckoning.should_send(update["ship"]):
+                yield update["ship"]
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        try:
+            if self.socket_path:
+                await self._consume_feed_socket()
+            else:
+                async for update in vessel.stream_vessel_updates(self.subscription, self.ship_static_info,
+                                                                 reconnect=self.reconnect):
+                    if self.track_store is not None:
+                        self.track_store.append(update["ship"])
+                    self.publish(update)
+            self.publish(ConnectionError("Vessel stream ended"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Vessel hub error: {e}")
+            self.publish(e)
+
+    async def _consume_feed_socket(self):
+        """Read newline delimited JSON updates from the ingestion process, reconnecting if it restarts."""
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.socket_path)
+            except OSError as e:
+                print(f"Vessel feed unavailable at {self.socket_path}: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            print(f"Connected to vessel feed at {self.socket_path}")
+            try:
+                while line := await reader.readline():
+                    try:
+                        update = json.loads(line)
+                    except ValueError as e:
+                        update = None
+                        print(f"Skipping unreadable vessel feed line: {e}")
+                    # A truncated or garbled line, e.g. from an ingest killed mid-write
+                    if not isinstance(update, dict) or not isinstance(update.get("ship"), dict):
+                        FEED_LINES_DROPPED.inc()
+                        continue
+                    self.publish(update)
+            except (ConnectionError, ValueError) as e:
+                # ValueError: a line longer than the stream reader's limit
+                print(f"Vessel feed connection lost: {e}")
+            finally:
+                writer.close()
+            print("Vessel feed closed, reconnecting")
+
+
+# Shared hub used by the WebSocket endpoints of this process
+hub = VesselHub(socket_path=FEED_SOCKET_PATH)
+
+metrics.Gauge("vessel_hub_subscribers", "WebSocket clients subscribed to vessel updates",
+              callback=lambda: len(hub.queue_depths()))
+metrics.Gauge("vessel_hub_queue_depth_max", "Deepest per-client update queue",
+              callback=lambda: max(hub.queue_depths(), default=0))
+metrics.Gauge("vessel_hub_queue_depth_total", "Updates queued across all clients",
+              callback=lambda: sum(hub.queue_depths()))
@@ -1,27 +1,45 @@
 import os
-import requests
 import json
 
+from data.fetch_gateway import FetchGateway
 
+# OpenWeatherMap free tier: 1000 calls per day; its 3-hourly forecast changes at most hourly
+WEATHER_GATEWAY = FetchGateway("openweathermap",
+                               daily_quota=int(os.getenv("WEATHER_DAILY_QUOTA", "1000")),
+                               ttl=float(os.getenv("WEATHER_CACHE_TTL", "3600")),
+                               cell_degrees=float(os.getenv("FORECAST_CELL_DEGREES", "0.25")))
 
-def update_port_weather(lat: float, lon: float):
-    """
-    Function to overwrite weather_data.json file with latest data from OpenWeatherMap API
-    """
-    # We add '&units=metric' to get Celsius and meters/sec (not Fahrenheit/mph)
+# Cell and fetch time of the forecast currently in weather_data.json
+_written = {"key": None}
+
+
+def fetch_port_weather(lat: float, lon: float) -> dict:
+    """Request the 5 day / 3 hour forecast for a point from OpenWeatherMap."""
+    import requests  # loaded on first use, see warmup.py
     appid = os.getenv("WEATHER_ID")
     url = f"https://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={appid}"
 
     response = requests.get(url)
-    data = response.json()
+    response.raise_for_status()
+    return response.json()
 
-    # 'list[0]' is the current 3-hour forecast
-    print(data)
-    with open("weather_data.json", 'w') as json_file:
-        json.dump(data, json_file, indent=4)
 
+def update_port_weather(lat: float, lon: float):
+    """
+    Function to overwrite weather_data.json file with latest data from OpenWeatherMap API.
+    Goes through the fetch gateway, returns where the data came from ("upstream", "cache", ...).
+    """
+    cell = WEATHER_GATEWAY.snap(lat, lon)
+    data, fetched_at, source = WEATHER_GATEWAY.fetch(cell, lambda: fetch_port_weather(*cell), manual=True)
+    print(f"Weather forecast for cell {cell}: {source}")
 
+    # Rewriting an unchanged file would needlessly invalidate the forecast caches
+    if _written["key"] != (cell, fetched_at):
+        with open("weather_data.json", 'w') as json_file:
+            json.dump(data, json_file, indent=4)
+        _written["key"] = (cell, fetched_at)
 
+    # 'list[0]' is the current 3-hour forecast
     forecast_list = data['list']
     current_forecast = forecast_list[0]
 
@@ -37,4 +55,5 @@ def update_port_weather(lat: float, lon: float):
     # This is your *predictive* signal
     next_forecast = forecast_list[1]
     predicted_wind = next_forecast['wind']['speed']
-    print(f"Wind in 3 hours: {predicted_wind} m/s")
\ No newline at end of file
+    print(f"Wind in 3 hours: {predicted_wind} m/s")
+    return source
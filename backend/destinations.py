@@ -0,0 +1,74 @@
+import re
+from functools import lru_cache
+
+from ports import PORTS
+
+# Resolves free-text AIS destinations ("NL RTM", "NLRTM", "ROTTERDAM>", "ROTTERDAM ANCH", ...)
+# to the port names in ports.PORTS. The alias table is compiled once at import; each raw string
+# is then resolved with a couple of dict lookups, and repeated strings come straight from an LRU.
+
+# Extra spellings seen in AIS traffic, on top of the port names and UN/LOCODEs themselves
+EXTRA_ALIASES = {
+    "ROTTERDAM": ["RTM", "R DAM", "EUROPOORT", "MAASVLAKTE", "HOEK VAN HOLLAND", "ROTTERDAM NL"],
+    "AMSTERDAM": ["AMS", "IJMUIDEN"],
+    "ANTWERP": ["ANTWERPEN", "ANVERS", "ANR", "ANTWERP BE"],
+    "HAMBURG": ["HAM", "HH", "HAMBURG DE"],
+    "BREMEN": ["BREMERHAVEN", "DEBRV", "BRV"],
+    "GENOA": ["GENOVA"],
+    "GDANSK": ["GDN", "DANZIG"],
+    "LAS PALMAS": ["LAS PALMAS DE GRAN CANARIA", "LPA"],
+}
+
+# Trailing words that qualify a destination without changing the port
+QUALIFIERS = {"ANCH", "ANCHORAGE", "ANCHOR", "ANC", "ROADS", "PILOT", "PILOTS", "PBG", "OPL", "PORT", "OFF",
+              "ORDERS", "FOR", "FO", "EOPL", "ARR", "ETA", "VIA"}
+
+_NON_ALNUM = re.compile(r"[^A-Z0-9]+")
+
+
+def _key(text: str) -> str:
+    """Normalized lookup key: upper case letters and digits only."""
+    return _NON_ALNUM.sub("", text.upper())
+
+
+def _build_alias_index() -> dict:
+    index = {}
+    for port, info in PORTS.items():
+        locode = info["locode"]
+        for alias in [port, locode, f"{locode[:2]} {locode[2:]}", *EXTRA_ALIASES.get(port, [])]:
+            index.setdefault(_key(alias), port)
+    return index
+
+
+ALIAS_INDEX = _build_alias_index()
+
+
+@lru_cache(maxsize=4096)
+def resolve_destination(raw: str):
+    """Return the port name a raw AIS destination refers to, or None if it is not a known port."""
+    if not raw:
+        return None
+    # "FROM>TO" is the conventional AIS way of stating a route, the port after the last ">" counts
+    segments = [segment for segment in raw.upper().split(">") if segment.strip()]
+    if not segments:
+        return None
+    words = _NON_ALNUM.sub(" ", segments[-1]).split()
+
+    # Try the whole destination, then with qualifiers ("ANCH", "PILOT", ...) stripped from the end
+    while words:
+        port = ALIAS_INDEX.get("".join(words))
+        if port is not None:
+            return port
+        if words[-1] not in QUALIFIERS:
+            break
+        words.pop()
+
+    # Finally the leading word alone, for destinations like "ROTTERDAM WAALHAVEN"
+    if words:
+        return ALIAS_INDEX.get(words[0])
+    return None
+
+
+def canonical_destination(raw: str) -> str:
+    """Port name for a known destination, otherwise the raw destination stripped of padding."""
+    return resolve_destination(raw) or (raw or "").strip()
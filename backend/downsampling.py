@@ -0,0 +1,82 @@
+import numpy as np
+
+# Downsampling of chart time series to a target number of points. "minmax" keeps the lowest and
+# highest value of every column in each bucket, so storm peaks always survive; "lttb" (Largest
+# Triangle Three Buckets) keeps the visually most significant point of one column per bucket.
+
+METHODS = ("minmax", "lttb")
+
+
+def minmax_indices(columns: list[np.ndarray], points: int) -> np.ndarray:
+    """
+    Row indices keeping the first and last row and the min and max of every column per bucket,
+    at most points of them.
+    """
+    n = len(columns[0])
+    if points >= n or n <= 2:
+        return np.arange(n)
+    if points < 2 + 2 * len(columns):
+        # Too few points for one bucket: the endpoints first, then the extremes column by column
+        keep = [0, n - 1]
+        for values in columns:
+            values = np.nan_to_num(np.asarray(values, dtype=float), nan=0.0)
+            keep += [int(np.argmin(values)), int(np.argmax(values))]
+        return np.sort(np.array(list(dict.fromkeys(keep))[:max(points, 1)]))
+    # Each bucket contributes up to two rows per column, the endpoints are kept on top
+    buckets = (points - 2) // (2 * len(columns))
+    edges = np.linspace(1, n - 1, buckets + 1).astype(int)
+    starts, ends = edges[:-1], edges[1:]
+    keep = [np.array([0, n - 1])]
+    for values in columns:
+        values = np.nan_to_num(np.asarray(values, dtype=float), nan=0.0)
+        for reducer in (np.minimum, np.maximum):
+            # Bucket-wise arg-extremes without a Python loop over buckets; the last row is left out
+            # of the last bucket, it is kept as an endpoint anyway
+            extremes = reducer.reduceat(values[:n - 1], starts)
+            is_extreme = values[1:n - 1] == np.repeat(extremes, ends - starts)
+            positions = np.flatnonzero(is_extreme) + 1
+            bucket_of = np.searchsorted(starts, positions, side="right") - 1
+            _, first = np.unique(bucket_of, return_index=True)
+            keep.append(positions[first])
+    return np.unique(np.concatenate(keep))
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Row indices selected by Largest Triangle Three Buckets on the (x, y) series."""
+    n = len(y)
+    if points >= n:
+        return np.arange(n)
+    if points < 3:
+        return np.array([0, n - 1])[:max(points, 1)]
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float), nan=0.0)
+    edges = np.linspace(1, n - 1, points - 1).astype(int)
+    # Averages of every bucket, used as the third triangle vertex of the bucket before it
+    sums_x = np.add.reduceat(x[:n - 1], edges[:-1])
+    sums_y = np.add.reduceat(y[:n - 1], edges[:-1])
+    sizes = np.diff(edges)
+    averages = list(zip(sums_x / sizes, sums_y / sizes)) + [(x[-1], y[-1])]
+
+    selected = np.empty(points, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_x, next_y = averages[bucket + 1]
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample(df, points: int, columns: list[str], method: str = "minmax", time_column: str = "timestamp"):
+    """Rows of df reduced to at most the given number of points, in time order."""
+    if points is None or len(df) <= points:
+        return df
+    if method == "lttb":
+        x = df[time_column].to_numpy(dtype="datetime64[s]").astype(float)
+        indices = lttb_indices(x, df[columns[0]].to_numpy(), points)
+    else:
+        indices = minmax_indices([df[column].to_numpy() for column in columns], points)
+    return df.iloc[indices]
@@ -0,0 +1,94 @@
+from fastapi import HTTPException
+import numpy as np
+import json
+from pathlib import Path
+import metrics
+from data.marine_ensemble import load_marine_stats
+
+# Weather (OpenWeatherMap) and marine (Stormglass) forecast files, loaded into normalized
+# DataFrames once per file version and shared by the analytics endpoints and ship risk scoring.
+
+# Get the directory where this file is located
+BASE_DIR = Path(__file__).resolve().parent
+
+
+FORECAST_CACHE_REQUESTS = metrics.Counter("forecast_cache_requests_total", "Forecast data loads by cache result", ["result"])
+FORECAST_RELOAD_SECONDS = metrics.Histogram("forecast_reload_seconds", "Time to read and normalize the forecast files")
+
+# Normalized forecast frames, reused until the underlying files change
+_forecast_cache = {"version": None, "data": None}
+
+
+def forecast_version():
+    """Identify the current forecast files by path and modification time."""
+    weather_path = BASE_DIR / "weather_data.json"
+    marine_path = BASE_DIR / "marine_data.json"
+    return (str(weather_path), weather_path.stat().st_mtime_ns, str(marine_path), marine_path.stat().st_mtime_ns)
+
+
+def load_and_normalize_data():
+    """
+    Load and normalize weather and marine data, reusing the cached frames while the JSON files
+    are unchanged. Callers must treat the returned frames as read-only.
+    """
+    try:
+        version = forecast_version()
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"Error loading data: {str(e)}")
+
+    if _forecast_cache["version"] == version:
+        FORECAST_CACHE_REQUESTS.labels("hit").inc()
+        return _forecast_cache["data"]
+
+    FORECAST_CACHE_REQUESTS.labels("miss").inc()
+    with FORECAST_RELOAD_SECONDS.time():
+        data = read_forecast_files()
+    _forecast_cache.update(version=version, data=data)
+    return data
+
+
+def read_forecast_files():
+    """Load and normalize weather and marine data from JSON files."""
+    import pandas as pd  # loaded on first use, see warmup.py
+
+    try:
+        # Load weather data
+        weather_path = BASE_DIR / "weather_data.json"
+        with open(weather_path) as f:
+            weather_raw = json.load(f)["list"]
+        
+        weather_df = pd.json_normalize(weather_raw)
+        
+        # Normalize weather data - select and rename columns
+        weather_df["timestamp"] = pd.to_datetime(weather_df["dt"], unit='s')
+        weather_df["windSpeed"] = weather_df["wind.speed"]
+        weather_df["windDeg"] = weather_df["wind.deg"]
+        weather_df["pop"] = weather_df["pop"]  # probability of precipitation
+        weather_df["temperature"] = weather_df["main.temp"]
+        weather_df["pressure"] = weather_df["main.pressure"]
+        # Visibility in meters, OpenWeatherMap omits it when unrestricted (10 km)
+        weather_df["visibility"] = weather_df["visibility"].fillna(10000) if "visibility" in weather_df else 10000
+        
+        weather_df = weather_df[["timestamp", "windSpeed", "windDeg", "pop", "temperature", "pressure", "visibility"]]
+        
+        # Marine data, reduced to per-hour ensemble statistics over the forecast sources when it
+        # was fetched (see data/marine_ensemble.py); outlier sources are already masked
+        stats = load_marine_stats(BASE_DIR / "marine_data.json")
+        marine_df = pd.DataFrame({
+            "timestamp": stats["time"].astype("datetime64[ns]"),
+            "waveHeight": stats["waveHeight.mean"],
+            "waveHeightSpread": stats["waveHeight.spread"],
+            "waveHeightMax": stats["waveHeight.max"],
+            "waveDirection": stats["waveDirection.mean"],
+            "currentSpeed": stats["currentSpeed.mean"],
+            "seaLevel": np.nan_to_num(stats["seaLevel.mean"], nan=0.0),
+        })
+        
+        return weather_df, marine_df
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading data: {str(e)}")
+
+
+def current_version():
+    """Version of the forecast files last loaded by load_and_normalize_data."""
+    return _forecast_cache["version"]
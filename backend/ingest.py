@@ -0,0 +1,88 @@
+import asyncio
+import collections
+import json
+import os
+import time
+
+from dotenv import load_dotenv
+
+import data.vessel as vessel
+from data.track_store import store as track_store
+from data.vessel_hub import offer, prune_vessel_state, SUBSCRIBER_QUEUE_SIZE, SNAPSHOT_MAX_AGE, STATE_SWEEP_INTERVAL
+from data.ais_subscription import SubscriptionManager
+from destinations import canonical_destination
+
+# Standalone AIS ingestion process for multi-worker deployments.
+# It holds the single aisstream.io connection and all vessel state, records vessel tracks, and
+# publishes every decoded update to the web workers over a Unix socket. To run:
+#   VESSEL_FEED_SOCKET=/tmp/shipvis_feed.sock python ingest.py
+#   VESSEL_FEED_SOCKET=/tmp/shipvis_feed.sock python -m uvicorn main:app --workers 4
+# The ingest cannot see which ports the workers' clients watch, so it subscribes to the whole
+# stream unless INGEST_PORTS (e.g. "ROTTERDAM,HAMBURG") restricts it to ships bound for those ports.
+
+load_dotenv()
+
+DEFAULT_SOCKET_PATH = "/tmp/shipvis_feed.sock"
+
+
+def ingest_subscription() -> SubscriptionManager:
+    # Same port names as the hub uses for /ws/ships?port=..., so "Rotterdam" and "NLRTM" select ROTTERDAM
+    ports = [canonical_destination(port) for port in os.getenv("INGEST_PORTS", "").split(",") if port.strip()]
+    return SubscriptionManager(os.getenv("AIS_API_KEY"), ["ShipStaticData", "PositionReport"],
+                               wide_demand=not ports, watched_ports=ports)
+
+
+async def serve(socket_path: str):
+    """Run the AIS ingest and publish its updates to every connected web worker."""
+    workers: set[asyncio.Queue] = set()
+    # mmsi -> (received_at, encoded update), least recently heard first, replayed to (re)connecting
+    # workers; vessels silent for SNAPSHOT_MAX_AGE are pruned as updates come in, with their static info
+    latest = collections.OrderedDict()
+    ship_static_info = {}
+    swept_at = time.monotonic()
+
+    async def handle_worker(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        workers.add(queue)
+        print(f"Web worker connected ({len(workers)} total)")
+        try:
+            cutoff = time.monotonic() - SNAPSHOT_MAX_AGE
+            for received_at, line in list(latest.values()):
+                if received_at >= cutoff:
+                    writer.write(line)
+            await writer.drain()
+            while True:
+                writer.write(await queue.get())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            workers.discard(queue)
+            writer.close()
+            print(f"Web worker disconnected ({len(workers)} total)")
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = await asyncio.start_unix_server(handle_worker, path=socket_path)
+    print(f"Publishing vessel updates on {socket_path}")
+
+    async with server:
+        subscription = ingest_subscription()
+        async for update in vessel.stream_vessel_updates(subscription, ship_static_info):
+            track_store.append(update["ship"])
+            # Encode once, then hand the same bytes to every worker
+            line = (json.dumps(update) + "\n").encode()
+            now = time.monotonic()
+            latest[update["ship"]["mmsi"]] = (now, line)
+            latest.move_to_end(update["ship"]["mmsi"])
+            sweep = now - swept_at >= STATE_SWEEP_INTERVAL
+            if sweep:
+                swept_at = now
+            for forgotten in prune_vessel_state(latest, ship_static_info, now, sweep):
+                subscription.forget(forgotten)
+            for queue in workers:
+                offer(queue, line)
+
+
+if __name__ == "__main__":
+    asyncio.run(serve(os.getenv("VESSEL_FEED_SOCKET", DEFAULT_SOCKET_PATH)))
@@ -1,21 +1,47 @@
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Query
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Query, Request
+from fastapi.responses import PlainTextResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
+import time
+import asyncio
 from fastapi.middleware.cors import CORSMiddleware # To allow frontend to connect
 import json
+import os
 
 import data.weather_fetch as weather_fetch
 import data.tides_fetch as tides_fetch
 import data.news_fetch as news_fetch
-import data.vessel as vessel
+from data.vessel_hub import hub as vessel_hub
+from data.stream_session import StreamSession
+from data.fetch_gateway import QuotaExhausted
 from dotenv import load_dotenv
 import analysis_router
+import tracks_router
+import metrics
+import warmup
+import admission
 # Download the required libraries using: pip install fastapi "uvicorn[standard]"
 # To run, type the following command into the terminal:
 # python -m uvicorn main:app --reload
+# To run several workers that share one AIS connection, start the ingestion process first:
+# VESSEL_FEED_SOCKET=/tmp/shipvis_feed.sock python ingest.py
+# VESSEL_FEED_SOCKET=/tmp/shipvis_feed.sock python -m uvicorn main:app --workers 4
 
 load_dotenv()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up pandas, the forecast data and the risk table in the background while serving."""
+    warmup_task = asyncio.create_task(warmup.warm_up())
+    yield
+    warmup_task.cancel()
+
+
 app = FastAPI(
+    lifespan=lifespan,
     title="Ship Visualization Backend",
     description="""
     Backend API for Ship Visualization Application
@@ -26,26 +52,80 @@ app = FastAPI(
     - **Protocol:** WebSocket
     - **URL:** `ws://localhost:8000/ws/ships?port={port_name}`
     - **Description:** Streams real-time position data for ships heading to the specified port
-    - **Query Parameters:** `port` (required) - Name of the destination port (e.g., "ROTTERDAM", "HAMBURG", "ANTWERP")
+    - **Query Parameters:** `port` (required) - Name of the destination port (e.g., "ROTTERDAM", "HAMBURG", "ANTWERP");
+      `dead_band` (optional, default false) - Skip updates that follow the dead-reckoned track, for clients that extrapolate
     - **Data Format:** JSON with fields: mmsi, ship_name, latitude, longitude, speed, course, heading, nav_status, timestamp, destination, call_sign, ship_type
     
     Connect using: `const ws = new WebSocket('ws://localhost:8000/ws/ships?port=ROTTERDAM');`
+
+    ### `/ws/stream` - Multiplexed Ship Tracking
+    - **Protocol:** WebSocket
+    - **URL:** `ws://localhost:8000/ws/stream`
+    - **Description:** Any number of port and filter subscriptions over one connection
+    - **Control Messages:** `{"action": "subscribe", "id": "rtm", "port": "ROTTERDAM", "min_length": 200, "ship_types": [70]}`
+      (port, min_length, ship_types and dead_band optional) and `{"action": "unsubscribe", "id": "rtm"}`
+    - **Data Format:** `{"type": "ship", "subscriptions": ["rtm"], "ship": {...}}` with the ship fields of `/ws/ships`,
+      plus `subscribed`, `unsubscribed` and `error` replies to control messages
+
+    ### `/ws/geofence_events` - Zone Arrivals and Departures
+    - **Protocol:** WebSocket
+    - **URL:** `ws://localhost:8000/ws/geofence_events?port={port_name}`
+    - **Description:** Streams enter, exit and dwell events of vessels in port, approach and anchorage zones
+    - **Query Parameters:** `port` (optional) - Only events for the zones of this port
+    - **Data Format:** JSON with fields: event, zone, port, kind, mmsi, ship_name, latitude, longitude, time, seconds_inside
+
+    ### Capacity limits
+    When the process or a port has as many stream clients as it admits, WebSocket endpoints close the
+    connection with code 1013 (Try Again Later) and a reason naming the retry delay; `/ws/stream` port
+    subscriptions are refused with an `error` reply carrying `retry_after`. Busy `/rotterdam` analytics
+    answer 503 with a `Retry-After` header.
     """,
     version="1.0.0"
 )
 
 
+# Include routers
+app.include_router(analysis_router.router)
+app.include_router(tracks_router.router)
+
+WEBSOCKET_SEND_SECONDS = metrics.Histogram("websocket_send_seconds", "Time to send one update to a WebSocket client", ["endpoint"])
+ROTTERDAM_REQUEST_SECONDS = metrics.Histogram("rotterdam_request_seconds", "Compute time of the /rotterdam endpoints", ["route"])
+
+
+@app.middleware("http")
+async def time_rotterdam_requests(request: Request, call_next):
+    """Record how long each /rotterdam endpoint takes to build its response."""
+    if not request.url.path.startswith("/rotterdam/"):
+        return await call_next(request)
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    if route is not None:
+        ROTTERDAM_REQUEST_SECONDS.labels(route.path).observe(time.perf_counter() - start)
+    return response
+
+@app.middleware("http")
+async def limit_rotterdam_requests(request: Request, call_next):
+    """Run at most ANALYTICS_CONCURRENCY /rotterdam computations at once, answering 503 beyond the queue."""
+    if not request.url.path.startswith("/rotterdam/"):
+        return await call_next(request)
+    try:
+        async with admission.analytics.slot("/rotterdam"):
+            return await call_next(request)
+    except admission.Shed as e:
+        return JSONResponse({"detail": str(e)}, status_code=503, headers={"Retry-After": str(e.retry_after)})
+
+# Added last so it is the outermost layer and also covers the 503s of the middlewares above;
+# Retry-After is exposed so the dashboard can read it
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://localhost:8000", "http://127.0.0.1:8000", "http://localhost:5173"],  # Common frontend ports
     allow_credentials=True,
     allow_methods=["GET", "POST"],  # Specify the methods you actually use
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
-# Include routers
-app.include_router(analysis_router.router)
-
 # api endpoints
 
 @app.get("/")
@@ -54,15 +134,41 @@ async def root():
     return {"status": "online", "timestamp": datetime.now().isoformat()}
 
 
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 503 until every subsystem has been warmed up, with the state of each"""
+    body = {"ready": warmup.ready(), "subsystems": warmup.status()}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus metrics for the AIS ingest, WebSocket fan-out, risk scoring and analytics"""
+    return metrics.render_latest()
+
+
+@app.get("/metrics/profile", response_class=PlainTextResponse)
+async def get_profile(seconds: float = Query(default=10.0, gt=0, le=60)):
+    """
+    Sample the event loop for the given number of seconds and return folded stacks for a flamegraph.
+    Only available when the ENABLE_PROFILER environment variable is set.
+    """
+    if not os.getenv("ENABLE_PROFILER"):
+        raise HTTPException(status_code=404, detail="Profiler disabled, set ENABLE_PROFILER=1 to enable it")
+    return await run_in_threadpool(metrics.sample_profile, seconds)
+
+
 @app.get("/api/port_surface_forecast")
 def update_port_forecast(lat: float, lon: float):
     """
     Endpoint to get overwrite weather_data.json file with latest data from OpenWeatherMap API
     """
     try:
-        weather_fetch.update_port_weather(lat=lat, lon=lon)
-        return {"status": "success", "message": "Weather data file updated"}
+        source = weather_fetch.update_port_weather(lat=lat, lon=lon)
+        return {"status": "success", "message": "Weather data file updated", "source": source}
     
+    except QuotaExhausted as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -78,9 +184,11 @@ def update_marine_forecast(
     Endpoint to obtain marine forecast data and save to marine_data.json file
     """
     try:
-        tides_fetch.update_marine_stats(lat=lat, lon=lon, start_time=start_date, end_time=end_date)
-        return {"status": "success", "message": "Marinal stats data file updated"}
+        source = tides_fetch.update_marine_stats(lat=lat, lon=lon, start_time=start_date, end_time=end_date)
+        return {"status": "success", "message": "Marinal stats data file updated", "source": source}
     
+    except QuotaExhausted as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
@@ -104,27 +212,28 @@ def get_news(
 
 
 @app.websocket("/ws/ships")
-async def websocket_ship_tracking(websocket: WebSocket, port: str = Query(...)):
+async def websocket_ship_tracking(websocket: WebSocket, port: str = Query(...), dead_band: bool = Query(default=False)):
     """
     WebSocket endpoint that streams real-time ship positions for the given port.
     Frontend connects to ws://localhost:8000/ws/ships?port={port_name} to receive live updates.
     
     Args:
         port: Name of the destination port (e.g., "ROTTERDAM", "HAMBURG", "ANTWERP")
+        dead_band: Skip updates the client can dead-reckon itself (for clients that extrapolate markers)
     """
     await websocket.accept()
     
     try:
-        # Start streaming ship data from AIS
-        # Using global bounding box to track all ships heading to Rotterdam
-        async for ship_data in vessel.predict_port_bound_ships(
-            bounding_box=[[-90, -180], [90, 180]],
-            port=port
-        ):
-            # Send ship position data to frontend
-            
-            await websocket.send_json(ship_data)
+        with admission.streams.connection("/ws/ships", port):
+            # Stream ship data from the shared AIS ingest of this process
+            send_seconds = WEBSOCKET_SEND_SECONDS.labels("/ws/ships")
+            async for ship_data in vessel_hub.ships_for_port(port, dead_band):
+                # Send ship position data to frontend
+                with send_seconds.time():
+                    await websocket.send_json(ship_data)
             
+    except admission.Shed as e:
+        await websocket.close(code=admission.WS_TRY_AGAIN_LATER, reason=e.close_reason)
     except WebSocketDisconnect:
         print("WebSocket client disconnected")
     except Exception as e:
@@ -148,17 +257,93 @@ async def websocket_ship_tracking(websocket: WebSocket, port: str = Query(...)):
 #         await websocket.close()
 
 @app.websocket("/ws/filtered_ships")
-async def websocket_filtered_ships(websocket: WebSocket):
+async def websocket_filtered_ships(websocket: WebSocket, dead_band: bool = Query(default=False)):
     """
     WebSocket endpoint that streams real-time position data for all ships in the bounding box.
     Frontend connects to ws://localhost:8000/ws/filtered_ships to receive live updates.
     """
     await websocket.accept()
     try:
-        async for ship_data in vessel.get_filtered_ships(bounding_box=[[-90, -180], [90, 180]]):
-            await websocket.send_json(ship_data)
+        with admission.streams.connection("/ws/filtered_ships"):
+            send_seconds = WEBSOCKET_SEND_SECONDS.labels("/ws/filtered_ships")
+            async for ship_data in vessel_hub.filtered_ships(dead_band):
+                with send_seconds.time():
+                    await websocket.send_json(ship_data)
+    except admission.Shed as e:
+        await websocket.close(code=admission.WS_TRY_AGAIN_LATER, reason=e.close_reason)
+    except WebSocketDisconnect:
+        print("WebSocket client disconnected")
+    except Exception as e:
+        print(f"WebSocket error: {e}")
+        await websocket.close()
+
+
+@app.websocket("/ws/geofence_events")
+async def websocket_geofence_events(websocket: WebSocket, port: str = Query(default=None)):
+    """
+    WebSocket endpoint that streams geofence enter/exit/dwell events, optionally for one port only.
+    Frontend connects to ws://localhost:8000/ws/geofence_events?port={port_name}.
+    """
+    await websocket.accept()
+    try:
+        with admission.streams.connection("/ws/geofence_events", port):
+            send_seconds = WEBSOCKET_SEND_SECONDS.labels("/ws/geofence_events")
+            async for event in vessel_hub.geofence_events(port):
+                with send_seconds.time():
+                    await websocket.send_json(event)
+    except admission.Shed as e:
+        await websocket.close(code=admission.WS_TRY_AGAIN_LATER, reason=e.close_reason)
+    except WebSocketDisconnect:
+        print("WebSocket client disconnected")
+    except Exception as e:
+        print(f"WebSocket error: {e}")
+        await websocket.close()
+
+
+@app.websocket("/ws/stream")
+async def websocket_multiplexed_stream(websocket: WebSocket):
+    """
+    WebSocket endpoint multiplexing several port and filter subscriptions over one connection.
+    Subscriptions are added and removed with control messages, see data/stream_session.py.
+    """
+    await websocket.accept()
+    try:
+        admission.streams.admit("/ws/stream")
+    except admission.Shed as e:
+        await websocket.close(code=admission.WS_TRY_AGAIN_LATER, reason=e.close_reason)
+        return
+    session = StreamSession(vessel_hub)
+    send_lock = asyncio.Lock()  # control replies and ship updates are sent from two tasks
+    send_seconds = WEBSOCKET_SEND_SECONDS.labels("/ws/stream")
+
+    async def receive_controls():
+        while True:
+            try:
+                replies = session.handle(json.loads(await websocket.receive_text()))
+            except json.JSONDecodeError:
+                replies = [{"type": "error", "detail": "Control messages must be JSON"}]
+            async with send_lock:
+                for reply in replies:
+                    await websocket.send_json(reply)
+
+    async def send_updates():
+        async for message in session.updates():
+            async with send_lock:
+                with send_seconds.time():
+                    await websocket.send_json(message)
+
+    tasks = [asyncio.create_task(receive_controls()), asyncio.create_task(send_updates())]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
     except WebSocketDisconnect:
         print("WebSocket client disconnected")
     except Exception as e:
         print(f"WebSocket error: {e}")
-        await websocket.close()
\ No newline at end of file
+        await websocket.close()
+    finally:
+        for task in tasks:
+            task.cancel()
+        session.close()
+        admission.streams.release()
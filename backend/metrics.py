@@ -0,0 +1,189 @@
+import bisect
+import collections
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Minimal in-process metrics in the Prometheus text exposition format.
+# Updates are plain attribute increments on pre-resolved children, cheap enough to leave on
+# for every AIS message. Served by the /metrics endpoint in main.py.
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_registry = []
+
+
+def _format_labels(label_names, label_values, extra=""):
+    pairs = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+        _registry.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *label_values):
+        """Return the child for the given label values; hold on to it on hot paths."""
+        child = self._children.get(label_values)
+        if child is None:
+            child = self._children[label_values] = self._new_child()
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for label_values, child in list(self._children.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, label_values)} {child.value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), callback=None):
+        # callback, if given, is evaluated at scrape time instead of tracking updates
+        self.callback = callback
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default.set(value)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def render(self):
+        if self.callback is not None:
+            self._default.set(self.callback())
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for label_values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, label_values, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, label_values)
+            lines.append(f"{self.name}_sum{labels} {child.sum}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+def render_latest() -> str:
+    """Render every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def sample_profile(seconds: float, interval: float = 0.005, thread_id: int = None) -> str:
+    """
+    Sample the stack of a thread (the event loop thread by default) for the given duration.
+    Returns folded stacks ("frame;frame;frame count" per line) ready for flamegraph tools.
+    Blocking, so call it from a worker thread.
+    """
+    thread_id = thread_id or threading.main_thread().ident
+    stacks = collections.Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+            frame = frame.f_back
+        if stack:
+            stacks[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
@@ -17,9 +17,21 @@ class ShipPositionData(BaseModel):
     call_sign: str
     ship_type: int
     eta: Optional[dict] = None
+    eta_time: Optional[str] = None  # ETA as ISO 8601 UTC, fixed when the ShipStaticData was decoded
     status: Optional[Literal['N/A', 'DOCK', 'DELAY', 'NO_DOCK']] = None
     risk_score: Optional[float] = None
     risk_factors: Optional[Dict[str, Union[str, float]]] = None
+    length: Optional[int] = None  # meters, bow to stern
+    enroute_risk: Optional[float] = None  # highest forecast risk along the next hours of the dead-reckoned path
+
+
+class StreamSubscription(BaseModel):
+    """Control message payload of the multiplexed /ws/stream endpoint."""
+    id: str
+    port: Optional[str] = None  # None streams every ship longer than 60m
+    min_length: int = 0  # meters
+    ship_types: Optional[List[int]] = None  # AIS type codes; a multiple of 10 matches the whole category
+    dead_band: bool = False  # skip updates the client can dead-reckon; only for clients that extrapolate
 
 class HourlyInsight(BaseModel):
     time: str
@@ -85,6 +97,37 @@ class RiskDistributionResponse(BaseModel):
     distribution: RiskDistribution
     total_hours: int
     percentages: dict
+
+
+class CongestionHour(BaseModel):
+    time: str
+    arrivals: int
+    by_status: Dict[str, int]  # DOCK, DELAY, NO_DOCK, N/A
+    by_ship_type: Dict[str, int]  # cargo, tanker, passenger, other
+
+
+class CongestionResponse(BaseModel):
+    city: str
+    hours: List[CongestionHour]
+    inbound: int  # port-bound vessels with a known ETA
+    delayed: int  # of which DELAY or NO_DOCK
+    by_status: Dict[str, int]
+
+
+class TrackPoint(BaseModel):
+    time: str
+    latitude: float
+    longitude: float
+    speed: Optional[float] = None
+    course: Optional[float] = None
+
+
+class VesselTrackResponse(BaseModel):
+    mmsi: int
+    start: str
+    end: str
+    total_points: int  # points stored in the range before simplification
+    points: List[TrackPoint]
 # class PositionReport(BaseModel):
 #     mmsi_id: int
 #     ship_name: str
@@ -0,0 +1,30 @@
+# Reference data for the ports the backend can track, keyed by the destination name clients
+# subscribe with (e.g. /ws/ships?port=ROTTERDAM). Coordinates match frontend/lib/portData.ts.
+PORTS = {
+    "ROTTERDAM": {"locode": "NLRTM", "latitude": 51.9225, "longitude": 4.4792},
+    "AMSTERDAM": {"locode": "NLAMS", "latitude": 52.3676, "longitude": 4.9041},
+    "ANTWERP": {"locode": "BEANR", "latitude": 51.2637, "longitude": 4.3996},
+    "HAMBURG": {"locode": "DEHAM", "latitude": 53.5511, "longitude": 9.9937},
+    "BREMEN": {"locode": "DEBRE", "latitude": 53.0793, "longitude": 8.8017},
+    "GENOA": {"locode": "ITGOA", "latitude": 44.4056, "longitude": 8.9463},
+    "THESSALONIKI": {"locode": "GRTHE", "latitude": 40.6401, "longitude": 22.9352},
+    "LAS PALMAS": {"locode": "ESLPA", "latitude": 28.1460, "longitude": -15.4117},
+    "GDANSK": {"locode": "PLGDN", "latitude": 54.5189, "longitude": 18.5305},
+    "ABERDEEN": {"locode": "GBABD", "latitude": 57.1497, "longitude": -2.0943},
+    "HOUSTON": {"locode": "USHOU", "latitude": 29.7604, "longitude": -95.3698},
+    "NORFOLK": {"locode": "USORF", "latitude": 36.8468, "longitude": -76.2951},
+    "DUBAI": {"locode": "AEDXB", "latitude": 25.0118, "longitude": 55.1050},
+    "MELBOURNE": {"locode": "AUMEL", "latitude": -37.8136, "longitude": 144.9631},
+}
+
+# Half-size in degrees of the box around a port that inbound traffic converges through
+APPROACH_MARGIN_DEGREES = 1.0
+
+
+def approach_box(port: str, margin: float = APPROACH_MARGIN_DEGREES):
+    """aisstream style [[lat, lon], [lat, lon]] bounding box around a port, or None if unknown."""
+    info = PORTS.get(port)
+    if info is None:
+        return None
+    return [[info["latitude"] - margin, info["longitude"] - margin],
+            [info["latitude"] + margin, info["longitude"] + margin]]
@@ -0,0 +1,53 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import websockets
+from dotenv import load_dotenv
+
+from data.ais_recording import RecordingWriter
+from data.vessel import AIS_STREAM_URL, GLOBAL_BOUNDING_BOX
+
+# Records the raw aisstream.io feed so it can be replayed offline with replay_ais.py. To run:
+#   python record_ais.py recordings/ais.jsonl.gz --duration 600
+
+load_dotenv()
+
+
+async def record(path: str, duration: float = None,
+                 filter_message_types: list[str] = ["ShipStaticData", "PositionReport"]):
+    """Append raw AIS messages to the recording at path until duration seconds have passed."""
+    deadline = time.monotonic() + duration if duration else None
+
+    with RecordingWriter(path) as writer:
+        async with websockets.connect(AIS_STREAM_URL) as websocket:
+            subscribe_message = {"APIKey": os.getenv("AIS_API_KEY"),
+                                 "BoundingBoxes": [GLOBAL_BOUNDING_BOX],
+                                 "FiltersShipMMSI": None,
+                                 "FilterMessageTypes": filter_message_types}
+            await websocket.send(json.dumps(subscribe_message))
+            print(f"Recording {AIS_STREAM_URL} to {path}")
+
+            async for message in websocket:
+                writer.write(message)
+                if writer.count % 1000 == 0:
+                    writer.flush()
+                    print(f"Recorded {writer.count} messages")
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+
+        print(f"Recorded {writer.count} messages to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record the raw AIS stream to a compressed file")
+    parser.add_argument("path", help="Recording file, appended to if it already exists")
+    parser.add_argument("--duration", type=float, default=None, help="Seconds to record (default: until interrupted)")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(record(args.path, duration=args.duration))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import json
+
+import websockets
+
+from data.ais_recording import read_recording
+
+# Local stand-in for wss://stream.aisstream.io/v0/stream that replays a recording made with
+# record_ais.py. Point the backend at it to benchmark ingest or reproduce production traffic offline:
+#   python replay_ais.py recordings/ais.jsonl.gz --speed 10
+#   AIS_STREAM_URL=ws://localhost:8765/v0/stream python -m uvicorn main:app
+
+
+def in_bounding_boxes(latitude: float, longitude: float, bounding_boxes: list) -> bool:
+    """Check whether a position lies in any of the aisstream style [[lat, lon], [lat, lon]] boxes."""
+    for (lat1, lon1), (lat2, lon2) in bounding_boxes:
+        if min(lat1, lat2) <= latitude <= max(lat1, lat2) and min(lon1, lon2) <= longitude <= max(lon1, lon2):
+            return True
+    return False
+
+
+def build_filter(subscription: dict):
+    """
+    Build a predicate applying the aisstream subscription filters to a raw message.
+    Returns None when the subscription does not narrow the stream, so the replay can skip decoding.
+    """
+    message_types = set(subscription.get("FilterMessageTypes") or [])
+    mmsis = {int(mmsi) for mmsi in subscription.get("FiltersShipMMSI") or []}
+    bounding_boxes = subscription.get("BoundingBoxes") or []
+    global_only = all(
+        min(lat1, lat2) <= -90 and max(lat1, lat2) >= 90 and min(lon1, lon2) <= -180 and max(lon1, lon2) >= 180
+        for (lat1, lon1), (lat2, lon2) in bounding_boxes
+    )
+    if not message_types and not mmsis and global_only:
+        return None
+
+    def matches(raw_message: str) -> bool:
+        message = json.loads(raw_message)
+        if message_types and message["MessageType"] not in message_types:
+            return False
+        metadata = message.get("MetaData", {})
+        if mmsis and metadata.get("MMSI") not in mmsis:
+            return False
+        if not global_only and not in_bounding_boxes(metadata.get("latitude", 0), metadata.get("longitude", 0), bounding_boxes):
+            return False
+        return True
+
+    return matches
+
+
+class ReplayServer:
+    """Serves a recorded AIS corpus to every client that subscribes, at a configurable speed."""
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = False):
+        self.records = list(read_recording(path))
+        self.speed = speed  # 0 replays as fast as the client can read
+        self.loop = loop
+        print(f"Loaded {len(self.records)} recorded messages from {path}")
+
+    async def handler(self, websocket):
+        # Like aisstream.io, a client may replace its subscription at any time by sending a new one
+        state = {"matches": build_filter(json.loads(await websocket.recv()))}
+        print(f"Replay client subscribed ({'filtered' if state['matches'] else 'unfiltered'})")
+
+        async def receive_subscriptions():
+            async for message in websocket:
+                state["matches"] = build_filter(json.loads(message))
+                print(f"Replay client resubscribed ({'filtered' if state['matches'] else 'unfiltered'})")
+
+        receiver = asyncio.create_task(receive_subscriptions())
+        sent = 0
+        try:
+            while True:
+                previous_t = None
+                for t, raw_message in self.records:
+                    if self.speed and previous_t is not None and t > previous_t:
+                        await asyncio.sleep((t - previous_t) / self.speed)
+                    previous_t = t
+                    matches = state["matches"]
+                    if matches is not None and not matches(raw_message):
+                        # Yield anyway: at max speed a filter rejecting everything would never await
+                        await asyncio.sleep(0)
+                        continue
+                    await websocket.send(raw_message)
+                    sent += 1
+                if not self.loop:
+                    break
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            receiver.cancel()
+        print(f"Replay client finished after {sent} messages")
+
+
+async def serve(path: str, host: str, port: int, speed: float, loop: bool):
+    replay = ReplayServer(path, speed=speed, loop=loop)
+    async with websockets.serve(replay.handler, host, port, max_size=None):
+        print(f"Replaying on ws://{host}:{port}/v0/stream at {'max' if not speed else f'{speed}x'} speed")
+        await asyncio.Future()
+
+
+def parse_speed(value: str) -> float:
+    return 0.0 if value == "max" else float(value)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded AIS stream as a local aisstream.io server")
+    parser.add_argument("path", help="Recording made with record_ais.py")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--speed", type=parse_speed, default=1.0, help="Playback speed factor, or 'max'")
+    parser.add_argument("--loop", action="store_true", help="Restart the recording when it ends")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.path, args.host, args.port, args.speed, args.loop))
+    except KeyboardInterrupt:
+        pass
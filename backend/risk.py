@@ -0,0 +1,197 @@
+import threading
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+import forecast
+import metrics
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# The one risk model of the backend. It is evaluated once per forecast version, vectorized over
+# every forecast time, into a time-indexed risk table. The /rotterdam dashboard endpoints read the
+# table directly and ship docking assessment is a lookup of the row nearest to the ship's ETA.
+
+# Conditions that rule out docking regardless of anything else
+WIND_SPEED_LIMIT = 18.0  # m/s
+WAVE_HEIGHT_LIMIT = 4.0  # meters
+
+# Conditions that start contributing to the score
+WAVE_HEIGHT_THRESHOLD = 2.0  # meters
+WIND_SPEED_THRESHOLD = 8.0  # m/s
+VISIBILITY_THRESHOLD = 5000  # meters
+PRECIPITATION_THRESHOLD = 0.5  # probability
+CROSS_ANGLE_RANGE = (75, 105)  # degrees between wind and waves
+
+# Score boundaries of the docking statuses and dashboard risk levels
+DOCK_THRESHOLD = 0.3  # below: DOCK / Safe
+HIGH_THRESHOLD = 0.5  # Moderate below, High above
+STORM_THRESHOLD = 0.7  # at or above: NO_DOCK / Dangerous
+
+RISK_TABLE_BUILD_SECONDS = metrics.Histogram("risk_table_build_seconds", "Time to evaluate the risk kernel over a forecast")
+
+# Risk table of the current forecast version
+_risk_table_cache = {"version": None, "table": None}
+_rebuild = {"thread": None}
+_rebuild_lock = threading.Lock()
+
+
+def risk_kernel(wind_speed, wind_direction, wave_height, wave_direction, visibility, pop=0.0):
+    """
+    Risk score in [0, 1] and wind/wave cross angle, for scalars or arrays of conditions.
+    Speeds in m/s, heights and visibility in meters, directions in degrees, pop the probability
+    of precipitation.
+    """
+    wind_speed = np.asarray(wind_speed, dtype=float)
+    wave_height = np.asarray(wave_height, dtype=float)
+    visibility = np.asarray(visibility, dtype=float)
+    pop = np.asarray(pop, dtype=float)
+
+    cross_angle = np.abs(np.asarray(wind_direction, dtype=float) - np.asarray(wave_direction, dtype=float)) % 360
+    cross_angle = np.minimum(cross_angle, 360 - cross_angle)
+
+    score = (np.where(wave_height > WAVE_HEIGHT_THRESHOLD, 0.4 * (wave_height / 3.0), 0.0)
+             + np.where(wind_speed > WIND_SPEED_THRESHOLD, 0.3 * (wind_speed / 10.0), 0.0)
+             + np.where(visibility < VISIBILITY_THRESHOLD, 0.2 * (1 - visibility / 10000), 0.0)
+             + np.where((cross_angle > CROSS_ANGLE_RANGE[0]) & (cross_angle < CROSS_ANGLE_RANGE[1]), 0.1, 0.0)
+             + np.where(pop > PRECIPITATION_THRESHOLD, 0.3 * pop, 0.0))
+    hard_limit = (wind_speed > WIND_SPEED_LIMIT) | (wave_height > WAVE_HEIGHT_LIMIT)
+    score = np.where(hard_limit, 1.0, np.minimum(score, 1.0))
+    return score, cross_angle
+
+
+def risk_factors(wind_speed: float, wave_height: float, visibility: float, cross_angle: float, pop: float = 0.0) -> dict:
+    """Human readable factors behind a risk score, as shown in the vessel sidebar."""
+    if wind_speed > WIND_SPEED_LIMIT:
+        return {"critical": f"Wind speed exceeds safety limit ({WIND_SPEED_LIMIT:g} m/s)"}
+    if wave_height > WAVE_HEIGHT_LIMIT:
+        return {"critical": f"Wave height exceeds safety limit ({WAVE_HEIGHT_LIMIT:.1f} m)"}
+
+    factors = {}
+    if wave_height > WAVE_HEIGHT_THRESHOLD:
+        factors["wave_height"] = f"High waves: {wave_height:.1f}m"
+    if wind_speed > WIND_SPEED_THRESHOLD:
+        factors["wind_speed"] = f"Strong winds: {wind_speed:.1f}m/s"
+    if visibility < VISIBILITY_THRESHOLD:
+        factors["visibility"] = f"Poor visibility: {visibility:g}m"
+    if CROSS_ANGLE_RANGE[0] < cross_angle < CROSS_ANGLE_RANGE[1]:
+        factors["cross_angle"] = "Dangerous cross-angle between wind and waves"
+    if pop > PRECIPITATION_THRESHOLD:
+        factors["precipitation"] = f"Likely precipitation: {pop:.0%}"
+    if not factors:
+        factors = {
+            "Status": "All conditions within safe limits",
+            "Wind Speed": wind_speed,
+            "Wave Height": wave_height,
+            "Visibility": visibility
+        }
+    return factors
+
+
+def docking_status(scores):
+    return np.select([scores < DOCK_THRESHOLD, scores < STORM_THRESHOLD], ["DOCK", "DELAY"], "NO_DOCK")
+
+
+def risk_level(scores):
+    return np.select([scores < DOCK_THRESHOLD, scores < HIGH_THRESHOLD, scores < STORM_THRESHOLD],
+                     ["Safe", "Moderate", "High"], "Dangerous")
+
+
+def merge_data(weather_df, marine_df):
+    """Conditions at every weather forecast time (3-hourly), joined with the marine forecast within 1 hour."""
+    import pandas as pd  # loaded on first use, see warmup.py
+
+    weather_df = weather_df.sort_values("timestamp")
+    marine_df = marine_df.sort_values("timestamp")
+
+    merged_df = pd.merge_asof(
+        weather_df,
+        marine_df,
+        on="timestamp",
+        direction="nearest",
+        tolerance=pd.Timedelta("1h")
+    )
+
+    # Drop rows with missing critical data
+    return merged_df.dropna(subset=["waveHeight", "windSpeed", "pop"]).reset_index(drop=True)
+
+
+def build_risk_table(weather_df, marine_df) -> "pd.DataFrame":
+    """Evaluate the risk kernel at every forecast time."""
+    df = merge_data(weather_df, marine_df)
+    scores, cross_angles = risk_kernel(df["windSpeed"].to_numpy(), df["windDeg"].to_numpy(),
+                                       df["waveHeight"].to_numpy(), df["waveDirection"].to_numpy(),
+                                       df["visibility"].to_numpy(), df["pop"].to_numpy())
+    df["risk_score"] = scores
+    df["cross_angle"] = cross_angles
+    df["storm_flag"] = scores >= STORM_THRESHOLD
+    df["risk_level"] = risk_level(scores)
+    df["status"] = docking_status(scores)
+    df["risk_factors"] = [
+        risk_factors(wind_speed, wave_height, visibility, cross_angle, pop)
+        for wind_speed, wave_height, visibility, cross_angle, pop
+        in zip(df["windSpeed"], df["waveHeight"], df["visibility"], cross_angles, df["pop"])
+    ]
+    return df
+
+
+class RiskTable:
+    """Risk table of one forecast version with nearest-row lookups."""
+
+    def __init__(self, frame: "pd.DataFrame"):
+        self.frame = frame
+        self._times = frame["timestamp"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        self._rows = list(zip(frame["status"], frame["risk_score"], frame["risk_factors"]))
+
+    def at(self, when: datetime):
+        """(status, risk_score, risk_factors) of the forecast hour nearest to when, or None if the table is empty."""
+        if not self._rows:
+            return None
+        # Forecast timestamps are naive UTC; naive datetimes passed in are taken as UTC too
+        if when.tzinfo is not None:
+            when = when.astimezone(timezone.utc).replace(tzinfo=None)
+        target = np.datetime64(when, "ns").astype(np.int64)
+        i = int(np.searchsorted(self._times, target))
+        if i == len(self._times) or (i > 0 and target - self._times[i - 1] <= self._times[i] - target):
+            i -= 1
+        status, score, factors = self._rows[i]
+        return status, float(score), factors
+
+
+def risk_table() -> RiskTable:
+    """Risk table of the current forecast files, rebuilt only when they change."""
+    weather_df, marine_df = forecast.load_and_normalize_data()
+    version = forecast.current_version()
+    if _risk_table_cache["version"] != version:
+        with RISK_TABLE_BUILD_SECONDS.time():
+            table = RiskTable(build_risk_table(weather_df, marine_df))
+        _risk_table_cache.update(version=version, table=table)
+    return _risk_table_cache["table"]
+
+
+def cached_risk_table():
+    """
+    Risk table for callers on the event loop, which must not load pandas or evaluate the model
+    inline: the table of the current forecast files once it is built, until then the previous
+    one (None before the first build) while a background thread builds it.
+    """
+    try:
+        version = forecast.forecast_version()
+    except OSError:
+        return _risk_table_cache["table"]
+    if _risk_table_cache["version"] != version:
+        with _rebuild_lock:
+            thread = _rebuild["thread"]
+            if thread is None or not thread.is_alive():
+                _rebuild["thread"] = threading.Thread(target=_rebuild_risk_table, name="risk-table-build", daemon=True)
+                _rebuild["thread"].start()
+    return _risk_table_cache["table"]
+
+
+def _rebuild_risk_table():
+    try:
+        risk_table()
+    except Exception as e:
+        print(f"Risk table build failed: {e}")
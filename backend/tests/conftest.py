@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# The backend modules import each other by top-level name (ports, risk, data.vessel, ...), as
+# they do when uvicorn runs from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
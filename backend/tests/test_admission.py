@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+import admission
+from admission import ConcurrencyLimit, Shed, StreamAdmission
+
+
+def test_process_limit():
+    streams = StreamAdmission(max_clients=2, max_per_port=10)
+    streams.admit("/ws/filtered_ships")
+    streams.admit("/ws/filtered_ships")
+    with pytest.raises(Shed) as shed:
+        streams.admit("/ws/filtered_ships")
+    assert shed.value.retry_after == admission.SHED_RETRY_AFTER
+    streams.release()
+    streams.admit("/ws/filtered_ships")
+    assert streams.clients == 2
+
+
+def test_port_limit_counts_every_spelling_of_a_port():
+    streams = StreamAdmission(max_clients=10, max_per_port=2)
+    streams.admit("/ws/ships", "ROTTERDAM")
+    streams.admit("/ws/ships", "NLRTM")
+    with pytest.raises(Shed, match="ROTTERDAM"):
+        streams.admit("/ws/ships", "rotterdam")
+    # A refused client takes no slot, and other ports are unaffected
+    assert streams.clients == 2
+    streams.admit("/ws/ships", "HAMBURG")
+    assert streams.watchers == {"ROTTERDAM": 2, "HAMBURG": 1}
+
+
+def test_release_frees_both_slots():
+    streams = StreamAdmission(max_clients=10, max_per_port=1)
+    streams.admit("/ws/ships", "ROTTERDAM")
+    streams.release("NL RTM")
+    assert streams.clients == 0
+    assert "ROTTERDAM" not in streams.watchers
+    streams.admit("/ws/ships", "ROTTERDAM")
+
+
+def test_connection_releases_on_error():
+    streams = StreamAdmission(max_clients=1, max_per_port=1)
+    with pytest.raises(RuntimeError):
+        with streams.connection("/ws/ships", "ROTTERDAM"):
+            assert streams.clients == 1
+            raise RuntimeError("client went away")
+    assert streams.clients == 0
+    assert not streams.watchers
+
+
+def test_watch_without_client_slot():
+    # Port subscriptions on /ws/stream take port slots within one admitted connection
+    streams = StreamAdmission(max_clients=1, max_per_port=1)
+    with streams.connection("/ws/stream"):
+        streams.watch("/ws/stream", "ROTTERDAM")
+        with pytest.raises(Shed):
+            streams.watch("/ws/stream", "ROTTERDAM")
+        streams.unwatch("ROTTERDAM")
+        streams.watch("/ws/stream", "ROTTERDAM")
+
+
+def test_concurrency_limit_sheds_beyond_the_queue():
+    async def scenario():
+        limit = ConcurrencyLimit(limit=2, max_waiting=1)
+        release = asyncio.Event()
+        running = 0
+
+        async def request():
+            nonlocal running
+            async with limit.slot("/rotterdam"):
+                running += 1
+                await release.wait()
+
+        tasks = [asyncio.create_task(request()) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert (running, limit.pending) == (2, 3)
+        with pytest.raises(Shed):
+            async with limit.slot("/rotterdam"):
+                pass
+        release.set()
+        await asyncio.gather(*tasks)
+        assert (running, limit.pending) == (3, 0)
+        async with limit.slot("/rotterdam"):
+            pass
+
+    asyncio.run(scenario())
+
+
+def test_close_reason_fits_a_close_frame():
+    shed = Shed("/ws/ships", "shed_port_limit", "Too many clients watching " + "X" * 200)
+    assert len(shed.close_reason.encode()) <= 123
+    assert Shed("/ws/ships", "shed_busy", "Busy", retry_after=7).close_reason == "Busy (retry after 7s)"
+
+
+def test_shed_analytics_answer_503_with_cors(monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+
+    monkeypatch.setattr(admission, "analytics", ConcurrencyLimit(limit=0, max_waiting=0))
+    response = TestClient(main.app).get("/rotterdam/insights", headers={"Origin": "http://localhost:3000"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == str(admission.SHED_RETRY_AFTER)
+    assert response.headers["access-control-allow-origin"] == "http://localhost:3000"
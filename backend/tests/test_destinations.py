@@ -0,0 +1,33 @@
+import pytest
+
+from destinations import canonical_destination, resolve_destination
+from ports import PORTS
+
+
+@pytest.mark.parametrize("raw", ["ROTTERDAM", "rotterdam", " Rotterdam ", "NLRTM", "NL RTM", "NL-RTM",
+                                 "EUROPOORT", "ROTTERDAM>", "ROTTERDAM ANCH", "ROTTERDAM PILOT",
+                                 "ROTTERDAM WAALHAVEN", "DEHAM>NLRTM", "HAMBURG > ROTTERDAM"])
+def test_rotterdam_spellings(raw):
+    assert resolve_destination(raw) == "ROTTERDAM"
+
+
+def test_every_port_resolves_by_name_and_locode():
+    for port, info in PORTS.items():
+        assert resolve_destination(port) == port
+        assert resolve_destination(info["locode"]) == port
+
+
+def test_route_uses_the_last_port():
+    assert resolve_destination("NLRTM>DEHAM") == "HAMBURG"
+
+
+@pytest.mark.parametrize("raw", ["", None, ">", "FOR ORDERS", "UNKNOWN PLACE", "ANCH"])
+def test_unknown_destinations(raw):
+    assert resolve_destination(raw) is None
+
+
+def test_canonical_destination_falls_back_to_stripped_raw():
+    assert canonical_destination("NL RTM") == "ROTTERDAM"
+    assert canonical_destination("  SOMEWHERE  ") == "SOMEWHERE"
+    assert canonical_destination("") == ""
+    assert canonical_destination(None) == ""
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsampling import downsample, lttb_indices, minmax_indices
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(0)
+    return [rng.random(1000) for _ in range(3)]
+
+
+@pytest.mark.parametrize("points", range(1, 40))
+def test_never_more_rows_than_points(series, points):
+    x = np.arange(1000.0)
+    for indices in (minmax_indices(series, points), minmax_indices(series[:1], points),
+                    lttb_indices(x, series[0], points)):
+        assert len(indices) <= points
+        assert np.all(np.diff(indices) > 0)
+
+
+def test_short_series_returned_whole(series):
+    assert list(minmax_indices([series[0][:5]], 10)) == [0, 1, 2, 3, 4]
+    assert list(lttb_indices(np.arange(5.0), series[0][:5], 10)) == [0, 1, 2, 3, 4]
+
+
+def test_minmax_keeps_endpoints_and_global_extremes(series):
+    indices = minmax_indices(series, 300)
+    assert indices[0] == 0 and indices[-1] == 999
+    for values in series:
+        assert np.argmax(values) in indices
+        assert np.argmin(values) in indices
+
+
+def test_minmax_keeps_peak_of_every_bucket():
+    values = np.zeros(100)
+    values[[10, 40, 70]] = [5.0, 7.0, 9.0]
+    indices = minmax_indices([values], 10)
+    assert {10, 40, 70} <= set(indices)
+
+
+def test_minmax_last_bucket_extreme_not_hidden_by_endpoint():
+    # The endpoint is the largest value; the last bucket's interior max (8 at row 8) must survive
+    values = np.array([5, 1, 2, 3, 4, 5, 6, 0.5, 8, 100.0])
+    indices = minmax_indices([values], 6)
+    assert 8 in indices and 7 in indices
+
+
+def test_minmax_below_one_bucket_prefers_endpoints_then_first_column(series):
+    indices = minmax_indices(series, 4)
+    assert set(indices) == {0, 999, int(np.argmin(series[0])), int(np.argmax(series[0]))}
+
+
+def test_lttb_keeps_a_spike():
+    y = np.zeros(500)
+    y[250] = 10.0
+    assert 250 in lttb_indices(np.arange(500.0), y, 20)
+
+
+def test_downsample_frame():
+    df = pd.DataFrame({"timestamp": pd.date_range("2026-01-01", periods=200, freq="h"),
+                       "risk_score": np.sin(np.arange(200) / 10)})
+    assert downsample(df, None, ["risk_score"]) is df
+    for method in ("minmax", "lttb"):
+        reduced = downsample(df, 50, ["risk_score"], method)
+        assert len(reduced) <= 50
+        assert reduced["timestamp"].is_monotonic_increasing
@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+
+import data.fetch_gateway as fetch_gateway
+from data.fetch_gateway import FetchGateway, QuotaExhausted
+
+
+@pytest.fixture
+def make_gateway(tmp_path):
+    def make(**kwargs):
+        options = {"provider": "test", "daily_quota": 3, "ttl": 60.0, "db_path": tmp_path / "gateway.sqlite"}
+        options.update(kwargs)
+        return FetchGateway(**options)
+    return make
+
+
+class Upstream:
+    def __init__(self, delay: float = 0.0):
+        self.calls = 0
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(self.delay)
+        return {"call": call}
+
+
+def test_snap_to_cell_centre(make_gateway):
+    gateway = make_gateway(cell_degrees=0.25)
+    assert gateway.snap(51.9, 4.4) == (51.875, 4.375)
+    assert gateway.snap(51.76, 4.26) == gateway.snap(51.99, 4.49)
+    assert gateway.snap(-0.1, -0.1) == (-0.125, -0.125)
+
+
+def test_cached_within_ttl(make_gateway):
+    gateway, upstream = make_gateway(), Upstream()
+    assert gateway.fetch(("a",), upstream)[2] == "upstream"
+    result, _, source = gateway.fetch(("a",), upstream)
+    assert (result, source, upstream.calls) == ({"call": 1}, "cache", 1)
+    assert gateway.remaining() == 2
+
+
+def test_concurrent_requests_share_one_call(make_gateway):
+    gateway, upstream = make_gateway(), Upstream(delay=0.2)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(gateway.fetch(("a",), upstream))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert upstream.calls == 1
+    assert {result[0]["call"] for result in results} == {1}
+    assert sorted(result[2] for result in results) == ["shared"] * 4 + ["upstream"]
+
+
+def test_processes_share_cache_and_quota(make_gateway):
+    # Two gateways on the same database stand in for two worker processes
+    first, second, upstream = make_gateway(), make_gateway(), Upstream()
+    first.fetch(("a",), upstream)
+    assert second.fetch(("a",), upstream)[2] == "cache"
+    second.fetch(("b",), upstream)
+    assert upstream.calls == 2
+    assert first.remaining() == second.remaining() == 1
+
+
+def test_quota_exhausted_without_cache(make_gateway):
+    gateway, upstream = make_gateway(daily_quota=1), Upstream()
+    gateway.fetch(("a",), upstream)
+    with pytest.raises(QuotaExhausted) as refused:
+        gateway.fetch(("b",), upstream)
+    assert 0 < refused.value.retry_after <= 24 * 3600
+    assert upstream.calls == 1
+    assert gateway.remaining() == 0
+
+
+def test_stale_result_once_quota_is_spent(make_gateway, monkeypatch):
+    gateway, upstream = make_gateway(daily_quota=1, ttl=10.0), Upstream()
+    gateway.fetch(("a",), upstream)
+    later = time.time() + 60
+    monkeypatch.setattr(fetch_gateway.time, "time", lambda: later)
+    result, _, source = gateway.fetch(("a",), upstream)
+    assert (result, source, upstream.calls) == ({"call": 1}, "stale", 1)
+
+
+def test_reserve_is_left_to_manual_fetches(make_gateway):
+    gateway, upstream = make_gateway(daily_quota=2, reserve=1), Upstream()
+    gateway.fetch(("a",), upstream)
+    with pytest.raises(QuotaExhausted):
+        gateway.fetch(("b",), upstream)
+    assert gateway.fetch(("b",), upstream, manual=True)[2] == "upstream"
+    with pytest.raises(QuotaExhausted):
+        gateway.fetch(("c",), upstream, manual=True)
+
+
+def test_failed_request_is_not_cached(make_gateway):
+    gateway = make_gateway()
+
+    def failing():
+        raise ConnectionError("upstream down")
+
+    with pytest.raises(ConnectionError):
+        gateway.fetch(("a",), failing)
+    upstream = Upstream()
+    assert gateway.fetch(("a",), upstream)[2] == "upstream"
+    assert upstream.calls == 1
+
+
+def test_record_usage_only_raises_the_count(make_gateway):
+    gateway = make_gateway(daily_quota=10)
+    gateway.fetch(("a",), Upstream())
+    gateway.fetch(("b",), Upstream())
+    gateway.record_usage(1)
+    assert gateway.remaining() == 8
+    gateway.record_usage(7, daily_quota=20)
+    assert gateway.remaining() == 13
+
+
+def test_remaining_before_first_fetch(make_gateway, tmp_path):
+    gateway = make_gateway()
+    assert gateway.remaining() == 3
+    assert not (tmp_path / "gateway.sqlite").exists()
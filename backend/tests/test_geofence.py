@@ -0,0 +1,75 @@
+import pytest
+
+from data.geofence import GeofenceEngine, GeofenceIndex, Zone, point_in_polygon
+
+SQUARE = [[0.0, 0.0], [0.0, 1.0], [1.0, 1.0], [1.0, 0.0]]
+
+
+@pytest.fixture
+def engine():
+    zones = [Zone("PORT", "TEST", "port", SQUARE),
+             Zone("APPROACH", "TEST", "approach", [[-1.0, -1.0], [-1.0, 2.0], [2.0, 2.0], [2.0, -1.0]])]
+    return GeofenceEngine(GeofenceIndex(zones, cell_degrees=0.25), dwell_seconds=100, silence_ttl=1000)
+
+
+def ship(mmsi, latitude, longitude):
+    return {"mmsi": mmsi, "ship_name": f"SHIP {mmsi}", "latitude": latitude, "longitude": longitude}
+
+
+def kinds(events):
+    return sorted((event["event"], event["zone"]) for event in events)
+
+
+def test_point_in_polygon():
+    assert point_in_polygon(0.5, 0.5, SQUARE)
+    assert not point_in_polygon(1.5, 0.5, SQUARE)
+    # Concave polygon: the notch is outside
+    notched = [[0, 0], [0, 3], [3, 3], [3, 2], [1, 2], [1, 1], [3, 1], [3, 0]]
+    assert not point_in_polygon(2.0, 1.5, notched)
+    assert point_in_polygon(0.5, 1.5, notched)
+
+
+def test_index_lookup():
+    index = GeofenceIndex([Zone("PORT", "TEST", "port", SQUARE)], cell_degrees=0.25)
+    assert [zone.id for zone in index.zones_at(0.5, 0.5)] == ["PORT"]
+    assert index.zones_at(5.0, 5.0) == []
+    assert index.zones_at(1.1, 0.5) == []
+
+
+def test_enter_dwell_exit(engine):
+    assert kinds(engine.update(ship(1, 0.5, 0.5), now=0)) == [("enter", "APPROACH"), ("enter", "PORT")]
+    assert engine.update(ship(1, 0.5, 0.5), now=50) == []
+    assert kinds(engine.update(ship(1, 0.5, 0.5), now=150)) == [("dwell", "APPROACH"), ("dwell", "PORT")]
+    assert engine.update(ship(1, 0.5, 0.5), now=300) == []  # dwell is reported once
+    events = engine.update(ship(1, 1.5, 1.5), now=400)
+    assert kinds(events) == [("exit", "PORT")]
+    assert events[0]["seconds_inside"] == 400
+    assert kinds(engine.update(ship(1, 5.0, 5.0), now=500)) == [("exit", "APPROACH")]
+    assert engine.occupancy() == {}
+
+
+def test_positions_outside_every_zone_keep_no_state(engine):
+    assert engine.update(ship(1, 5.0, 5.0), now=0) == []
+    assert engine.occupancy() == {}
+
+
+def test_silent_vessels_exit_and_are_pruned(engine):
+    engine.update(ship(1, 0.5, 0.5), now=0)
+    engine.update(ship(2, 1.5, 1.5), now=600)
+    assert engine.occupancy() == {"PORT": 1, "APPROACH": 2}
+
+    # Vessel 1 has been silent for the TTL; any update expires it
+    events = engine.update(ship(3, 5.0, 5.0), now=1000)
+    assert kinds(events) == [("exit", "APPROACH"), ("exit", "PORT")]
+    assert all(event["mmsi"] == 1 and event["latitude"] == 0.5 for event in events)
+    assert engine.occupancy() == {"APPROACH": 1}
+
+    assert kinds(engine.expire(now=1600)) == [("exit", "APPROACH")]
+    assert engine.occupancy() == {}
+
+
+def test_heard_vessels_are_not_expired(engine):
+    engine.update(ship(1, 0.5, 0.5), now=0)
+    engine.update(ship(1, 0.5, 0.6), now=900)
+    assert engine.expire(now=1500) == []
+    assert engine.occupancy() == {"PORT": 1, "APPROACH": 1}
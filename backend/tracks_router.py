@@ -0,0 +1,58 @@
+from fastapi import APIRouter, HTTPException, Query
+from models import VesselTrackResponse, TrackPoint
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from data.track_store import store, simplify_track
+
+router = APIRouter(prefix="/api/tracks", tags=["Vessel Tracks"])
+
+
+def _parse_time(value: str) -> datetime:
+    """Parse an ISO timestamp, treating naive timestamps as UTC."""
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Invalid ISO timestamp: {value}")
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+@router.get("/{mmsi}", response_model=VesselTrackResponse)
+def get_vessel_track(
+    mmsi: int,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    tolerance: float = Query(default=0.0, ge=0, description="Simplification tolerance in meters, 0 returns every point")
+):
+    """
+    Get the recorded track of a vessel between start and end (ISO timestamps).
+
+    Defaults to the last 6 hours. Use a larger tolerance at coarse zoom levels to get a
+    Douglas-Peucker simplified track with far fewer points.
+    """
+    end_dt = _parse_time(end) if end else datetime.now(timezone.utc)
+    start_dt = _parse_time(start) if start else end_dt - timedelta(hours=6)
+    if start_dt > end_dt:
+        raise HTTPException(status_code=422, detail="start must be before end")
+
+    rows = store.get_track(mmsi, start_dt, end_dt)
+    simplified = simplify_track(rows, tolerance)
+
+    return VesselTrackResponse(
+        mmsi=mmsi,
+        start=start_dt.isoformat(),
+        end=end_dt.isoformat(),
+        total_points=len(rows),
+        points=[
+            TrackPoint(
+                time=datetime.fromtimestamp(t, tz=timezone.utc).isoformat(),
+                latitude=latitude,
+                longitude=longitude,
+                speed=speed,
+                course=course
+            )
+            for t, latitude, longitude, speed, course in simplified
+        ]
+    )
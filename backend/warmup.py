@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import metrics
+
+# pandas, the forecast frames, the risk table and the HTTP client are loaded on first use so the
+# server can accept WebSockets as soon as it starts. The lifespan of main.py warms them up in a
+# background task instead, one subsystem after the other off the event loop, so that the first
+# /rotterdam request or ship risk assessment does not pay for it. GET /ready reports progress.
+
+SUBSYSTEM_WARM = metrics.Gauge("subsystem_warm", "1 once a subsystem has been warmed up", ["subsystem"])
+WARMUP_SECONDS = metrics.Histogram("subsystem_warmup_seconds", "Time to warm up a subsystem", ["subsystem"],
+                                   buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+
+
+def _warm_analytics():
+    import pandas
+    import forecast
+    forecast.load_and_normalize_data()
+
+
+def _warm_risk():
+    import risk
+    from data.forecast_grid import grids as forecast_grids
+    risk.risk_table()
+    forecast_grids.grids()
+
+
+def _warm_news():
+    import ssl
+    import requests
+    # First TLS handshake parses the CA bundle; do it once here so the page cache has it
+    ssl.create_default_context(cafile=requests.certs.where())
+
+
+# Warmed in this order; risk needs the forecast frames loaded by analytics
+SUBSYSTEMS = {
+    "analytics": _warm_analytics,  # pandas and the normalized forecast frames
+    "risk": _warm_risk,  # hourly risk table for ship scoring and the dashboard, en-route forecast grids
+    "news": _warm_news,  # HTTP client for the news and forecast APIs
+}
+
+WARMUP_RETRY_INTERVAL = 30.0  # seconds between retries of failed warm-ups
+
+_status = {name: {"state": "cold"} for name in SUBSYSTEMS}
+
+
+def status() -> dict:
+    """State of every subsystem: cold, warming, warm or failed, with warm-up time or error."""
+    return {name: dict(state) for name, state in _status.items()}
+
+
+def ready() -> bool:
+    """True once every subsystem is warm; a failed warm-up keeps the process not ready until a retry succeeds."""
+    return all(state["state"] == "warm" for state in _status.values())
+
+
+async def warm_up(retry: bool = True):
+    """
+    Warm up all subsystems in worker threads, logging failures instead of raising, then (with
+    retry) try the failed ones again every WARMUP_RETRY_INTERVAL until they are warm.
+    """
+    await _warm(SUBSYSTEMS)
+    while retry:
+        failed = {name: warm for name, warm in SUBSYSTEMS.items() if _status[name]["state"] == "failed"}
+        if not failed:
+            break
+        await asyncio.sleep(WARMUP_RETRY_INTERVAL)
+        await _warm(failed)
+
+
+async def _warm(subsystems: dict):
+    for name, warm in subsystems.items():
+        _status[name] = {"state": "warming"}
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(warm)
+        except Exception as e:
+            # Usually missing forecast files; the subsystem also loads on its first real use
+            print(f"Warm-up of {name} failed: {e}")
+            _status[name] = {"state": "failed", "error": str(e)}
+            continue
+        seconds = time.perf_counter() - start
+        WARMUP_SECONDS.labels(name).observe(seconds)
+        SUBSYSTEM_WARM.labels(name).set(1)
+        _status[name] = {"state": "warm", "seconds": round(seconds, 3)}
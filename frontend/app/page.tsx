@@ -18,13 +18,13 @@ export default function Home() {
     lastMessage: shipsLastMessage, 
     vessels: shipsVessels, 
     error: shipsError 
-  } = useWebSocket('ws://localhost:8000/ws/ships?port=ROTTERDAM');
+  } = useWebSocket('ws://localhost:8000/ws/ships?port=ROTTERDAM&dead_band=true');
   const { 
     status: filteredStatus, 
     lastMessage: filteredLastMessage, 
     vessels: filteredVessels, 
     error: filteredError 
-  } = useWebSocket('ws://localhost:8000/ws/filtered_ships');
+  } = useWebSocket('ws://localhost:8000/ws/filtered_ships?dead_band=true');
 
   // Log ship tracking data
   useEffect(() => {
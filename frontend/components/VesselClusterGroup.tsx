@@ -1,12 +1,13 @@
 'use client'
 
-import { useEffect, useMemo, memo } from 'react'
+import { useEffect, useMemo, useRef, memo } from 'react'
 import L from 'leaflet'
 import 'leaflet.markercluster'
 import 'leaflet.markercluster/dist/MarkerCluster.css'
 import 'leaflet.markercluster/dist/MarkerCluster.Default.css'
 import { useMap } from 'react-leaflet'
 import { ShipData } from '@/lib/types'
+import { extrapolatePosition, EXTRAPOLATION_INTERVAL_MS } from '@/lib/deadReckoning'
 
 // Get ship type symbol
 const getVesselSymbol = (shipType: number) => {
@@ -84,6 +85,8 @@ interface VesselClusterGroupProps {
 
 function VesselClusterGroupComponent({ vessels, onVesselClick }: VesselClusterGroupProps) {
   const map = useMap()
+  // Markers currently on the map with the update they were created from, for dead reckoning
+  const markersRef = useRef<{ marker: L.Marker, vessel: ShipData }[]>([])
 
   // Memoize the cluster group to prevent recreation on every render
   const markerClusterGroup = useMemo(() => {
@@ -155,10 +158,12 @@ function VesselClusterGroupComponent({ vessels, onVesselClick }: VesselClusterGr
   useEffect(() => {
     // Clear existing markers
     markerClusterGroup.clearLayers()
+    markersRef.current = []
+    const now = Date.now()
 
     // Add new markers
     vessels.forEach(vessel => {
-      const marker = L.marker([vessel.latitude, vessel.longitude], {
+      const marker = L.marker(extrapolatePosition(vessel, now), {
         icon: createVesselIcon(vessel)
       })
 
@@ -189,9 +194,29 @@ function VesselClusterGroupComponent({ vessels, onVesselClick }: VesselClusterGr
       })
 
       markerClusterGroup.addLayer(marker)
+      markersRef.current.push({ marker, vessel })
     })
   }, [vessels, markerClusterGroup, onVesselClick])
 
+  // Move every marker along its dead-reckoned track from one shared animation loop,
+  // without re-rendering or rebuilding the markers
+  useEffect(() => {
+    let frame: number
+    let lastMove = 0
+    const step = (time: number) => {
+      if (time - lastMove >= EXTRAPOLATION_INTERVAL_MS) {
+        lastMove = time
+        const now = Date.now()
+        markersRef.current.forEach(({ marker, vessel }) => {
+          marker.setLatLng(extrapolatePosition(vessel, now))
+        })
+      }
+      frame = requestAnimationFrame(step)
+    }
+    frame = requestAnimationFrame(step)
+    return () => cancelAnimationFrame(frame)
+  }, [])
+
   // Add/remove cluster group from map
   useEffect(() => {
     map.addLayer(markerClusterGroup)
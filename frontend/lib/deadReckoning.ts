@@ -0,0 +1,23 @@
+import { ShipData } from './types';
+
+// The backend can skip position updates that follow the dead-reckoned track (see
+// backend/data/dead_reckoning.py), so markers are moved along their last course and speed
+// in between updates, with the same extrapolation as the server.
+export const EXTRAPOLATION_INTERVAL_MS = 1000;
+const MAX_EXTRAPOLATION_MS = 5 * 60 * 1000;
+const METERS_PER_DEGREE = 111320;
+const KNOTS_TO_MPS = 0.514444;
+
+export function extrapolatePosition(vessel: ShipData, now: number): [number, number] {
+  const { latitude, longitude, speed, course, received_at } = vessel;
+  // 102.3 kn and 360° are the AIS "not available" values
+  if (!received_at || speed <= 0 || speed >= 102.3 || course >= 360) {
+    return [latitude, longitude];
+  }
+  const elapsed = Math.min(now - received_at, MAX_EXTRAPOLATION_MS) / 1000;
+  const distance = speed * KNOTS_TO_MPS * elapsed;
+  const courseRad = (course * Math.PI) / 180;
+  const dLat = (distance * Math.cos(courseRad)) / METERS_PER_DEGREE;
+  const dLon = (distance * Math.sin(courseRad)) / (METERS_PER_DEGREE * Math.max(Math.cos((latitude * Math.PI) / 180), 1e-6));
+  return [latitude + dLat, longitude + dLon];
+}
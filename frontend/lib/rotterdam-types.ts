@@ -52,6 +52,21 @@ export interface RiskDistributionResponse {
   percentages: RiskPercentages;
 }
 
+export interface CongestionHour {
+  time: string;
+  arrivals: number;
+  by_status: Record<string, number>;
+  by_ship_type: Record<'cargo' | 'tanker' | 'passenger' | 'other', number>;
+}
+
+export interface CongestionResponse {
+  city: string;
+  hours: CongestionHour[];
+  inbound: number;
+  delayed: number;
+  by_status: Record<string, number>;
+}
+
 export interface InsightsDataPoint {
   time: string;
   waveHeight: number;
@@ -82,10 +97,14 @@ export interface InsightsResponse {
 // API endpoint URLs
 export const ROTTERDAM_API_BASE = 'http://localhost:8000/rotterdam';
 
+// Upper bound on points per chart series; the backend downsamples longer forecasts keeping peaks
+export const CHART_MAX_POINTS = 500;
+
 export const ROTTERDAM_ENDPOINTS = {
-  RISK_TIMELINE: `${ROTTERDAM_API_BASE}/risk-timeline`,
-  MULTI_METRIC: `${ROTTERDAM_API_BASE}/multi-metric`,
+  RISK_TIMELINE: `${ROTTERDAM_API_BASE}/risk-timeline?points=${CHART_MAX_POINTS}`,
+  MULTI_METRIC: `${ROTTERDAM_API_BASE}/multi-metric?points=${CHART_MAX_POINTS}`,
   RISK_DISTRIBUTION: `${ROTTERDAM_API_BASE}/risk-distribution`,
+  CONGESTION: `${ROTTERDAM_API_BASE}/congestion`,
   INSIGHTS: `${ROTTERDAM_API_BASE}/insights`,
 } as const;
 
@@ -14,6 +14,7 @@ export interface ShipData {
   status?: 'N/A' | 'DOCK' | 'DELAY' | 'NO_DOCK';
   risk_score?: number;
   risk_factors?: { [key: string]: string | number };
+  received_at?: number; // client clock (ms) when this update arrived, used for dead reckoning
 }
 
 export type WebSocketStatus = 'connecting' | 'connected' | 'disconnected' | 'error';
\ No newline at end of file
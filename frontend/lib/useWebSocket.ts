@@ -1,6 +1,9 @@
 import { useEffect, useRef, useState } from 'react';
 import { ShipData, WebSocketStatus } from './types';
 
+const RECONNECT_BASE_DELAY_MS = 1000;
+const RECONNECT_MAX_DELAY_MS = 30000;
+
 interface UseWebSocketReturn {
   status: WebSocketStatus;
   lastMessage: ShipData | null;
@@ -15,6 +18,7 @@ export function useWebSocket(url: string, enabled: boolean = true): UseWebSocket
   const [error, setError] = useState<string | null>(null);
   const wsRef = useRef<WebSocket | null>(null);
   const reconnectTimeoutRef = useRef<NodeJS.Timeout | null>(null);
+  const reconnectAttemptsRef = useRef(0);
 
   const connect = () => {
     if (wsRef.current?.readyState === WebSocket.OPEN) {
@@ -29,6 +33,7 @@ export function useWebSocket(url: string, enabled: boolean = true): UseWebSocket
       wsRef.current = ws;
 
       ws.onopen = () => {
+        reconnectAttemptsRef.current = 0;
         setStatus('connected');
         console.log('WebSocket connected to ship tracking');
       };
@@ -61,7 +66,8 @@ export function useWebSocket(url: string, enabled: boolean = true): UseWebSocket
             ship_type: rawData.ship_type || 0,
             status: rawData.status,
             risk_score: processedRiskScore,
-            risk_factors: rawData.risk_factors
+            risk_factors: rawData.risk_factors,
+            received_at: Date.now()
           };
 
           // Only update if we have valid coordinates and MMSI
@@ -91,14 +97,24 @@ export function useWebSocket(url: string, enabled: boolean = true): UseWebSocket
         }
       };
 
-      ws.onclose = () => {
+      ws.onclose = (event) => {
         setStatus('disconnected');
         console.log('WebSocket disconnected');
         
+        // Exponential backoff with full jitter, so a backend restart doesn't get every client back at once
+        const maxDelay = Math.min(RECONNECT_MAX_DELAY_MS, RECONNECT_BASE_DELAY_MS * 2 ** reconnectAttemptsRef.current);
+        let delay = Math.random() * maxDelay;
+        if (event.code === 1013) {
+          // Backend at capacity: wait at least the retry delay it named in the close reason
+          const retryAfter = /retry after (\d+)s/.exec(event.reason);
+          delay += (retryAfter ? Number(retryAfter[1]) : 5) * 1000;
+        }
+        reconnectAttemptsRef.current += 1;
+
         reconnectTimeoutRef.current = setTimeout(() => {
           console.log('Attempting to reconnect...');
           connect();
-        }, 3000);
+        }, delay);
       };
 
       ws.onerror = (err) => {